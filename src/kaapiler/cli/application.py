@@ -1,10 +1,12 @@
 import argparse
 import logging
 from pathlib import Path
+import sys
+import time
 
 from utils import bytes_to_hex, bytes_to_python
 
-from ..core import KaaCompiler
+from ..core import KaaCompiler, KaaIncrementalCompiler, KaaSourceMap
 
 
 class Application:
@@ -24,9 +26,18 @@ class Application:
         parser.add_argument("input_file", type=str, help="Path to the input file")
         parser.add_argument("-o", "--output_file", type=str, default=None, help="Path to the output file")
         parser.add_argument("-f", "--output_format", type=str, choices=["hex", "python", "binary"], default="binary", help="Output format")
+        parser.add_argument("-m", "--source_map", type=str, default=None, help="Path to the source map file (address to source line, JSON)")
         parser.add_argument("-t", "--output_target", type=str, default="kapu8", help="Compilation target")
+        parser.add_argument("-p", "--parser", type=str, choices=KaaCompiler.PARSERS, default=KaaCompiler.PARSER_PLY, help="Parser: PLY (reference), FAST single-pass parser for large sources, or CHECK both (error when they differ)")
+        parser.add_argument("-s", "--stream", action="store_true", help="Compile the input while reading it, writing the output file as it goes (constant memory, binary output file only)")
+        parser.add_argument("-w", "--watch", action="store_true", help="Recompile the input file each time it changes, rewriting the output (incremental, until interrupted)")
+        parser.add_argument("--watch_interval", type=float, default=0.05, help="Seconds between two checks of the watched file (default: 0.05)")
         parser.add_argument("-d", "--debug_level", type=str, choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], default="ERROR", help="Debugging level")
         parsed_args = parser.parse_args(args)
+        if parsed_args.stream and (parsed_args.output_file is None or parsed_args.output_format != self.OUTPUT_FORMAT_BINARY):
+            parser.error("--stream writes a binary output file (-o FILE -f binary)")
+        if parsed_args.stream and parsed_args.watch:
+            parser.error("--stream and --watch cannot be combined")
         if self.logger:
             self.logger.debug(f"Parsed arguments: {parsed_args}")
         return parsed_args
@@ -39,9 +50,64 @@ class Application:
         with input_path.open("rt") as f:
             return f.read()
 
-    def compile_data(self, input_data: str, target: str) -> bytes:
-        compiler = KaaCompiler(target=target)
-        return compiler.compile(input_data)
+    def compile_data(self, input_data: str, target: str, source_map: KaaSourceMap = None, parser: str = KaaCompiler.PARSER_PLY) -> bytes:
+        compiler = KaaCompiler(target=target, parser=parser)
+        return compiler.compile(input_data, source_map)
+
+    def stream_compile(self, input_file: str, output_file: str, target: str, source_map: KaaSourceMap = None, parser: str = KaaCompiler.PARSER_PLY) -> int:
+        # Compile the input file into the output file chunk by chunk, the output file is removed on errors
+        if not Path(input_file).exists():
+            self.logger.error(f"Input file '{input_file}' does not exist.")
+            raise FileNotFoundError(f"Input file '{input_file}' does not exist.")
+        compiler = KaaCompiler(target=target, parser=parser)
+        try:
+            with open(input_file, "rt") as reader, open(output_file, "wb") as writer:
+                size = compiler.compile_stream(reader, writer, source_map)
+        except Exception:
+            Path(output_file).unlink(missing_ok=True)
+            raise
+        self.logger.info(f"Output written to '{output_file}' ({size} bytes).")
+        return size
+
+    def compile_incremental(self, compiler: KaaIncrementalCompiler, arguments: argparse.Namespace) -> int:
+        # One compilation of the watched file, the output (and source map) being rewritten
+        input_data = self.read_input_file(arguments.input_file)
+        source_map = KaaSourceMap(Path(arguments.input_file).name) if arguments.source_map else None
+        compiled_bytes = compiler.compile(arguments.input_file, input_data, source_map)
+        if source_map is not None:
+            self.write_source_map(source_map, arguments.source_map)
+        self.write_output(self.format_output(compiled_bytes, arguments.output_format), arguments.output_file)
+        return len(compiled_bytes)
+
+    def watch(self, arguments: argparse.Namespace):
+        # Recompile the input file each time it changes (modification time or size), until interrupted
+        compiler = KaaIncrementalCompiler(KaaCompiler(target=arguments.output_target, parser=arguments.parser))
+        input_path = Path(arguments.input_file)
+        version = None
+        print(f"Watching '{input_path}' (Ctrl+C to stop)", file=sys.stderr)
+        try:
+            while True:
+                try:
+                    stat = input_path.stat()
+                    current = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    current = None  # Being replaced by an editor
+                if current is not None and current != version:
+                    version = current
+                    encoded = compiler.encoded
+                    start = time.perf_counter()
+                    try:
+                        size = self.compile_incremental(compiler, arguments)
+                        print(f"Compiled '{input_path}': {size} bytes, {compiler.encoded - encoded} lines encoded, {(time.perf_counter() - start) * 1000:.1f}ms", file=sys.stderr)
+                    except Exception as e:
+                        self.logger.error(f"Compilation of '{input_path}' failed: {e}")
+                time.sleep(arguments.watch_interval)
+        except KeyboardInterrupt:
+            pass
+
+    def write_source_map(self, source_map: KaaSourceMap, source_map_file: str):
+        source_map.save(source_map_file)
+        self.logger.info(f"Source map written to '{source_map_file}'.")
 
     def format_output(self, compiled_bytes: bytes, output_format: str):
         match output_format:
@@ -64,10 +130,18 @@ class Application:
         try:
             arguments = self.parse_arguments(args)
             self.configure_logger(arguments.debug_level)
-            input_data = self.read_input_file(arguments.input_file)
-            compiled_bytes = self.compile_data(input_data, arguments.output_target)
-            formatted_output = self.format_output(compiled_bytes, arguments.output_format)
-            self.write_output(formatted_output, arguments.output_file)
+            if arguments.watch:
+                return self.watch(arguments)
+            source_map = KaaSourceMap(Path(arguments.input_file).name) if arguments.source_map else None
+            if arguments.stream:
+                self.stream_compile(arguments.input_file, arguments.output_file, arguments.output_target, source_map, arguments.parser)
+            else:
+                input_data = self.read_input_file(arguments.input_file)
+                compiled_bytes = self.compile_data(input_data, arguments.output_target, source_map, arguments.parser)
+                formatted_output = self.format_output(compiled_bytes, arguments.output_format)
+                self.write_output(formatted_output, arguments.output_file)
+            if source_map is not None:
+                self.write_source_map(source_map, arguments.source_map)
         except Exception as e:
             if self.logger:
                 self.logger.error(f"An error occurred: {e}")
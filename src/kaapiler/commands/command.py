@@ -6,6 +6,9 @@ class KaaCommand:
         0: "REG_CHAN_ENABLED",
         1: "REG_CHAN_LEFT",
         2: "REG_CHAN_RIGHT",
+        3: "REG_MIX_VOLUME_A",
+        4: "REG_MIX_VOLUME_B",
+        5: "REG_MIX_FLAGS",
     }
     CHANNEL_REGISTERS = {
         0: "REG_PHASE_IDS",
@@ -26,6 +26,8 @@ class SetCommand(KaaCommand):
         Note: Constants available for the registerId:
             - REG_CHAN_ENABLED = 0 : Channel enabled register, value is an enabling bitmask, each bit (LSB to MSB) corresponds to a channel (0-7).
             - REG_CHAN_LEFT = 1, REG_CHAN_RIGHT = 2 : Channel left/right enabled register, value is an enabling bitmask, each bit (LSB to MSB) corresponds to a channel (0-7).
+            - REG_MIX_VOLUME_A = 3, REG_MIX_VOLUME_B = 4 : Mixing volume of channels 0-3 / 4-7, 2 bits per channel (LSB to MSB), 00 = 100%, 01 = 50%, 10 = 25%, 11 = 12.5%.
+            - REG_MIX_FLAGS = 5 : Mixing flags, bit 0 = MixingAvg (0: mixing buffer capped at 255, 1: mixing buffer divided by 8).
     """
 
     OPCODE = 0b0001  # Opcode for SetChannelEnabled command
@@ -1,3 +1,6 @@
+from .kaa_analyzer import KaaAnalysis, KaaAnalyzer
 from .kaa_compiler import KaaCompiler
+from .kaa_incremental_compiler import KaaIncrementalCompiler
+from .kaa_source_map import KaaSourceMap
 
-__all__ = ["KaaCompiler"]
+__all__ = ["KaaAnalysis", "KaaAnalyzer", "KaaCompiler", "KaaIncrementalCompiler", "KaaSourceMap"]
@@ -0,0 +1,122 @@
+from ..commands.kapu8 import *
+from ..commands import KaaCommand
+
+
+class KaaAnalysis:
+    """Result of KaaAnalyzer.analyze.
+
+    - cycles     : APU cycles to the end of the program (the command pointer going back to 0),
+                   or to the end of the first iteration of the infinite loop
+    - samples    : Samples emitted during these cycles
+    - commands   : Commands executed during these cycles
+    - infinite   : True when the program never ends (JUMP/LOOP cycle without exit)
+    - loopStart  : INFINITE: cycle at which the infinite loop is entered
+    - loopPeriod : INFINITE: cycles per iteration of the infinite loop
+    """
+
+    def __init__(self, cycles: int, samples: int, commands: int, infinite: bool = False, loopStart: int = None, loopPeriod: int = None):
+        self.cycles = cycles
+        self.samples = samples
+        self.commands = commands
+        self.infinite = infinite
+        self.loopStart = loopStart
+        self.loopPeriod = loopPeriod
+
+    def __str__(self) -> str:
+        if self.infinite:
+            return f"Infinite program: loop of {self.loopPeriod} cycles entered at cycle {self.loopStart}"
+        return f"{self.cycles} cycles, {self.samples} samples, {self.commands} commands"
+
+    def __repr__(self) -> str:
+        return f"KaaAnalysis(cycles={self.cycles}, samples={self.samples}, commands={self.commands}, infinite={self.infinite}, loopStart={self.loopStart}, loopPeriod={self.loopPeriod})"
+
+
+class KaaAnalyzer:
+    """Static duration analyzer of a compiled KAA binary.
+
+    Walks the program one command at a time, as the APU would execute it: each command takes one
+    cycle, a WAIT n is followed by n NOOP cycles and a SYNC n by the NOOP cycles up to the n-th
+    sampling cycle (one every `ratio` cycles, starting at cycle 0). LOOP and JUMP move the command
+    pointer as in the APU. The walk stops when the command pointer leaves the program (the APU goes
+    back to the first command), or when the same execution state is met twice (infinite loop).
+    """
+
+    CONTROL_COMMANDS = [WaitCommand, SyncCommand, LoopCommand, JumpCommand]
+    OTHER_COMMANDS = [SetCommand, SetPhaseCommand, SetChannelCommand, SaveCommand, LoadCommand]
+
+    def __init__(self, ratio: int = 16):
+        self.ratio = ratio
+
+    def decode(self, data: bytes, address: int) -> KaaCommand:
+        # Decode the control commands, the others only matter for their size
+        opcode = data[address]
+        command = SyncCommand if opcode == SyncCommand.OPCODE else None
+        for commandClass in self.CONTROL_COMMANDS + self.OTHER_COMMANDS:
+            if command is None and (opcode >> 4) == commandClass.OPCODE:
+                command = commandClass
+        if command is None:
+            raise ValueError(f"Unknown command {opcode:08b} @{address:03x}")
+        if address + command.OPSIZE > len(data):
+            raise ValueError(f"Truncated {command.MNEMONIC} command @{address:03x}")
+        if command in self.CONTROL_COMMANDS:
+            return command.decode(data[address:address + command.OPSIZE])
+        return command()
+
+    def analyze(self, data: bytes) -> KaaAnalysis:
+        if not data:
+            raise ValueError("Empty program")
+        decoded = {}  # Per address
+        visited = {}  # Execution state -> cycle
+        aip = 0
+        cycle = 0
+        commands = 0
+        loopAddress = loopCountdown = loopLength = loopCommandCountdown = 0
+        while True:
+            # Same state as before: the APU will repeat the same commands forever
+            state = (aip, loopAddress, loopCountdown, loopLength, loopCommandCountdown, cycle % self.ratio)
+            if state in visited:
+                loopStart = visited[state]
+                return KaaAnalysis(cycle, self.samples(cycle), commands, True, loopStart, cycle - loopStart)
+            visited[state] = cycle
+
+            # Loop check, before the command is executed
+            if loopCountdown > 0:
+                if loopCommandCountdown == 0:
+                    aip = loopAddress
+                    loopCountdown -= 1
+                    loopCommandCountdown = loopLength
+                loopCommandCountdown -= 1
+
+            if aip not in decoded:
+                decoded[aip] = self.decode(data, aip)
+            command = decoded[aip]
+            commands += 1
+            nextCycle = cycle + 1
+            match command:
+                case SyncCommand():
+                    # Decremented on sampling cycles only (multiples of the ratio): the next command comes right after the last one
+                    if command.waitCount > 0:
+                        nextCycle = (cycle // self.ratio + command.waitCount) * self.ratio + 1
+                    aip += command.OPSIZE
+                case WaitCommand():
+                    nextCycle += command.waitCount
+                    aip += command.OPSIZE
+                case LoopCommand():
+                    loopAddress = aip + command.OPSIZE
+                    loopCountdown = command.loopCount
+                    loopLength = command.loopLength
+                    loopCommandCountdown = loopLength
+                    aip += command.OPSIZE
+                case JumpCommand():
+                    aip = command.address
+                case _:
+                    aip += command.OPSIZE
+            cycle = nextCycle
+
+            # The APU resets the command pointer once out of bounds: end of the program
+            if aip >= len(data):
+                return KaaAnalysis(cycle, self.samples(cycle), commands)
+
+    def samples(self, cycles: int) -> int:
+        # Samples emitted by the first cycles (sampling on cycles 0, ratio, 2 x ratio...)
+        return (cycles + self.ratio - 1) // self.ratio
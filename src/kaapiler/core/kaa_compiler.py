@@ -1,17 +1,98 @@
+from collections.abc import Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from itertools import islice
+from typing import BinaryIO
+
 from ..commands.kapu8 import *
 from ..commands import KaaCommand
-from ..parser import kaaLexer, kaaParser
+from ..parser import KaaFastParser, newKaaLexer, newKaaParser
+from .kaa_source_map import KaaSourceMap
 
 class KaaCompiler:
-    """A simple compiler for the Kaa programming language."""
+    """A simple compiler for the Kaa programming language.
+
+    The compiler is reentrant: each compilation parses with a lexer and a parser of its own (sharing
+    the tables built once per process), so an instance can compile from several threads at once, as
+    in a long-running build service. compile_many compiles several sources in a pool.
+
+    The source is parsed by the PLY parser (PARSER_PLY, the reference), by the single-pass
+    KaaFastParser (PARSER_FAST, for large machine-generated sources), or by both (PARSER_CHECK),
+    a ValueError being raised when their statements differ.
+
+    compile_stream compiles a source read line by line, STREAM_CHUNK_LINES lines at a time, each
+    chunk being written as soon as it is compiled: the memory used does not depend on the size of
+    the source (but for the source map, when one is filled). The statements being line-local, the
+    output is the same as compile, except after syntax errors, recovered from within their chunk.
+    """
+
+    PARSER_PLY = "ply"
+    PARSER_FAST = "fast"
+    PARSER_CHECK = "check"
+    PARSERS = [PARSER_PLY, PARSER_FAST, PARSER_CHECK]
+    STREAM_CHUNK_LINES = 4096
 
-    def __init__(self, target: str = "kapu8"):
+    def __init__(self, target: str = "kapu8", parser: str = PARSER_PLY):
+        if parser not in self.PARSERS:
+            raise ValueError(f"Unknown parser: {parser}")
         self.target = target
+        self.parser = parser
+        self.fastParser = KaaFastParser()
         self.logger = None
 
-    def compile(self, code: str) -> bytes:
-        statements : list[tuple[str,list]] = kaaParser.parse(code, lexer=kaaLexer)
-        return b"".join([self.getCommand(s).encode() for s in statements])
+    def parse(self, code: str, firstLine: int = 1) -> list[tuple[str,list,int]]:
+        # (opcode, parameters, line number) of each statement, the source starting at line firstLine
+        match self.parser:
+            case self.PARSER_FAST:
+                return self.fastParser.parse(code, firstLine)
+            case self.PARSER_CHECK:
+                return self.crossCheck(code, firstLine)
+        return newKaaParser().parse(code, lexer=newKaaLexer(firstLine))
+
+    def crossCheck(self, code: str, firstLine: int = 1) -> list[tuple[str,list,int]]:
+        # Statements of the PLY parser, checked against the fast parser ones (when it accepts the source)
+        reference = newKaaParser().parse(code, lexer=newKaaLexer(firstLine))
+        statements = self.fastParser.scan(code, firstLine)
+        if statements is not None and statements != reference:
+            index = next((i for i, (fast, ply) in enumerate(zip(statements, reference)) if fast != ply), min(len(statements), len(reference)))
+            fast = statements[index] if index < len(statements) else None
+            ply = reference[index] if index < len(reference) else None
+            raise ValueError(f"Parsers differ on statement {index + 1}: fast {fast}, ply {ply}")
+        return reference
+
+    def compile(self, code: str, sourceMap: KaaSourceMap = None) -> bytes:
+        # When a source map is given, it is filled with the address and source line of each command
+        return self.encode(code, sourceMap)
+
+    def encode(self, code: str, sourceMap: KaaSourceMap = None, address: int = 0, firstLine: int = 1) -> bytes:
+        # Binary of a source (or of a part of it, starting at line firstLine, its first command at address)
+        statements = self.parse(code, firstLine)
+        encoded = [self.getCommand(s).encode() for s in statements]
+        if sourceMap is not None:
+            lines = code.split("\n")  # Line breaks of the lexer
+            for statement, command in zip(statements, encoded):
+                line = statement[2] - firstLine + 1
+                sourceMap.add(address, len(command), statement[2], " ".join(lines[line - 1].split()) if line <= len(lines) else "")
+                address += len(command)
+        return b"".join(encoded)
+
+    def compile_stream(self, reader: Iterable[str], writer: BinaryIO, sourceMap: KaaSourceMap = None) -> int:
+        # Compile the lines of reader (a text file...) chunk by chunk into writer (a binary file, buffer...), return the bytes written
+        lines = iter(reader)
+        address = 0
+        firstLine = 1
+        while chunk := list(islice(lines, self.STREAM_CHUNK_LINES)):
+            data = self.encode("".join(chunk), sourceMap, address, firstLine)
+            writer.write(data)
+            address += len(data)
+            firstLine += len(chunk)
+        return address
+
+    def compile_many(self, codes: Iterable[str], executor: Executor = None, workers: int = None) -> list[bytes]:
+        # Compile the sources in the given executor, or in a pool of threads of its own, results in the order of the sources
+        if executor is not None:
+            return list(executor.map(self.compile, codes))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.compile, codes))
 
     def getCommand(self, statement:tuple) -> KaaCommand:
         mnemonic = statement[0].upper()
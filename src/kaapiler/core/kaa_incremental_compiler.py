@@ -0,0 +1,97 @@
+from collections import OrderedDict
+
+from .kaa_compiler import KaaCompiler
+from .kaa_source_map import KaaSourceMap
+
+
+class KaaIncrementalCompiler:
+    """Recompiles edited sources, encoding only the lines that changed.
+
+    KAA statements are line-local: each line is compiled on its own and its binary is cached by
+    normalized statement text (comment, case and extra spaces ignored, as by the lexer), so a line met
+    before, in this file or another, is not encoded again (up to CACHE_SIZE statements, the least
+    recently used ones being dropped). The lines and their binaries of the previous compilation of each
+    file are kept too: the lines before and after the edited region are spliced as they are, only the
+    lines in between are looked up in the cache, or encoded.
+
+    A source with a line the fast scanner does not accept (syntax error, illegal character...) is
+    compiled as a whole by the compiler, so the errors are reported the same way.
+    """
+
+    CACHE_SIZE = 65536
+
+    def __init__(self, compiler: KaaCompiler = None, cacheSize: int = CACHE_SIZE):
+        self.compiler = compiler or KaaCompiler()
+        self.cacheSize = cacheSize
+        self.statements = OrderedDict()                             # Normalized statement -> binary
+        self.files: dict[str, tuple[list[str], list[bytes]]] = {}  # Name -> lines and binary of each line
+        self.encoded = 0  # Lines encoded
+        self.cached = 0   # Lines found in the statement cache
+        self.spliced = 0  # Lines kept from the previous compilation of their file
+
+    def normalize(self, line: str) -> str:
+        # Statement text: without comment, uppercase, tokens separated by one space (the lexer ignores spaces and tabs only)
+        if not line.isascii():
+            return "\0" + line  # Case folding beyond ASCII is left to the lexer
+        return " ".join(filter(None, line.split("#", 1)[0].upper().replace("\t", " ").split(" ")))
+
+    def encodeLine(self, line: str, number: int) -> bytes:
+        # Binary of a line (empty without statement), None when it cannot be compiled on its own
+        key = self.normalize(line)
+        binary = self.statements.get(key)
+        if binary is not None:
+            self.statements.move_to_end(key)
+            self.cached += 1
+            return binary
+        if self.compiler.fastParser.scan(line, number) is None:
+            return None
+        binary = self.compiler.encode(line, firstLine=number)
+        self.encoded += 1
+        self.statements[key] = binary
+        if len(self.statements) > self.cacheSize:
+            self.statements.popitem(last=False)
+        return binary
+
+    def compile(self, name: str, code: str, sourceMap: KaaSourceMap = None) -> bytes:
+        # Same binary as KaaCompiler.compile, the previous compilation of the file (by name) being reused
+        lines = code.split("\n")
+        previousLines, previousBinaries = self.files.get(name, ([], []))
+        limit = min(len(lines), len(previousLines))
+        head = 0
+        while head < limit and lines[head] == previousLines[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and lines[-1 - tail] == previousLines[-1 - tail]:
+            tail += 1
+
+        binaries = previousBinaries[:head]
+        for index in range(head, len(lines) - tail):
+            binary = self.encodeLine(lines[index], index + 1)
+            if binary is None:
+                self.files.pop(name, None)
+                return self.compiler.compile(code, sourceMap)
+            binaries.append(binary)
+        binaries += previousBinaries[len(previousBinaries) - tail:]
+        self.spliced += head + tail
+        self.files[name] = (lines, binaries)
+
+        if sourceMap is not None:
+            address = 0
+            for number, (line, binary) in enumerate(zip(lines, binaries), 1):
+                if binary:
+                    sourceMap.add(address, len(binary), number, " ".join(line.split()))
+                    address += len(binary)
+        return b"".join(binaries)
+
+    def forget(self, name: str):
+        # Drop the previous compilation of a file
+        self.files.pop(name, None)
+
+    def statistics(self) -> dict:
+        return {
+            "encoded": self.encoded,
+            "cached": self.cached,
+            "spliced": self.spliced,
+            "statements": len(self.statements),
+            "files": len(self.files),
+        }
@@ -0,0 +1,52 @@
+import json
+from bisect import bisect_right
+
+
+class KaaSourceMap:
+    """Address -> source line map of a compiled KAA program.
+
+    One entry per encoded command: (address, size, line, text), text being the stripped source line.
+    Saved as a JSON file next to the binary, so that the simulator can report per-line information
+    without depending on the compiler.
+    """
+
+    VERSION = 1
+
+    def __init__(self, source: str = None):
+        self.source = source  # Name of the compiled file (informative)
+        self.entries: list[tuple[int, int, int, str]] = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, address: int, size: int, line: int, text: str):
+        self.entries.append((address, size, line, text))
+
+    def line(self, address: int) -> int:
+        # Source line of the command covering the address (None if out of the program)
+        index = bisect_right([entry[0] for entry in self.entries], address) - 1
+        if index < 0 or address >= self.entries[index][0] + self.entries[index][1]:
+            return None
+        return self.entries[index][2]
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.VERSION,
+            "source": self.source,
+            "commands": [{"address": a, "size": s, "line": l, "text": t} for a, s, l, t in self.entries],
+        }
+
+    def save(self, path: str):
+        with open(path, "wt") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path: str) -> 'KaaSourceMap':
+        with open(path, "rt") as f:
+            content = json.load(f)
+        if content.get("version") != cls.VERSION:
+            raise ValueError(f"Unsupported source map version: {content.get('version')}")
+        sourceMap = cls(content.get("source"))
+        for command in content["commands"]:
+            sourceMap.add(command["address"], command["size"], command["line"], command["text"])
+        return sourceMap
@@ -1,7 +1,22 @@
-from .kaa_lexer import kaaLexer
-from .kaa_parser import kaaParser
+from .kaa_fast_parser import KaaFastParser
+from .kaa_tables import getKaaLexer, getKaaParser, newKaaLexer, newKaaParser
 
 __all__ = [
+    "KaaFastParser",
+    "getKaaLexer",
+    "getKaaParser",
     "kaaLexer",
     "kaaParser",
-]
\ No newline at end of file
+    "newKaaLexer",
+    "newKaaParser",
+]
+
+
+def __getattr__(name: str):
+    # kaaLexer and kaaParser are built on first use
+    match name:
+        case "kaaLexer":
+            return getKaaLexer()
+        case "kaaParser":
+            return getKaaParser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,43 @@
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+from .kaa_fast_parser import syntheticSource, throughput
+from .kaa_tables import KAA_STARTUP_BUDGET, benchmark, logger, writeTables
+
+
+def main(args: list[str] = None):
+    parser = argparse.ArgumentParser(prog="python -m kaapiler.parser", description="KAA lexer and parser tables and benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Generate the table modules")
+    build.add_argument("-O", "--output-dir", type=str, default=None, help="Directory of the table modules (default: the kaapiler.parser package)")
+    bench = commands.add_parser("benchmark", help="Measure the kaapiler start-up, fail when it exceeds the budget, writes files or rebuilds the tables")
+    bench.add_argument("-n", "--runs", type=int, default=10, help="Number of kaapiler runs (default: 10)")
+    bench.add_argument("-b", "--budget", type=float, default=KAA_STARTUP_BUDGET, help=f"Start-up budget in seconds, median of the runs (default: {KAA_STARTUP_BUDGET})")
+    speed = commands.add_parser("throughput", help="Lines per second of the PLY and the fast parsers, fail when they disagree")
+    speed.add_argument("inputs", type=str, nargs="*", help="KAA source files (default: a synthetic source)")
+    speed.add_argument("-l", "--lines", type=int, default=100000, help="Lines of the synthetic source (default: 100000)")
+    speed.add_argument("-n", "--runs", type=int, default=3, help="Runs per parser, the best one is kept (default: 3)")
+    arguments = parser.parse_args(args)
+    logging.basicConfig(level=logging.INFO)
+    match arguments.command:
+        case "build":
+            for path in writeTables(arguments.output_dir):
+                logger.info(f"Tables written to '{path}'")
+        case "benchmark":
+            result = benchmark(arguments.runs, arguments.budget)
+            print(json.dumps(result, indent=2))
+            if not result["ok"]:
+                sys.exit(1)
+        case "throughput":
+            sources = {path: Path(path).read_text() for path in arguments.inputs} or {"synthetic": syntheticSource(arguments.lines)}
+            results = {name: throughput(code, arguments.runs) for name, code in sources.items()}
+            print(json.dumps(results, indent=2))
+            if not all(result["identical"] for result in results.values()):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import logging
+import re
+
+from .kaa_tables import newKaaLexer, newKaaParser
+
+# Tokens of a statement parameter, in the order of the PLY lexer rules (kaa_lexer): the first matching one wins
+KAA_FAST_PARAMETER_TOKENS = [
+    r'0b[01][01_]+',                # NUMBER (binary)
+    r'0o[0-7]+',                    # NUMBER (octal)
+    r'0x[0-9A-Fa-f]+',              # NUMBER (hexadecimal)
+    r'[+-]?[0-9]+(?:e[0-9]+)?',     # NUMBER (decimal)
+    r'CHAN[0-7]|CHAN_ALL',          # ID_CHANNEL
+    r'PHASE1[0-5]|PHASE[0-9]',      # ID_PHASE
+    r'REG_CHAN_ENABLED|REG_CHAN_LEFT|REG_CHAN_RIGHT|REG_MIX_VOLUME_A|REG_MIX_VOLUME_B|REG_MIX_FLAGS|REG_PHASE_IDS',  # ID_REGISTER
+]
+KAA_FAST_OPCODES = r'NOOP|WAIT|SYNC|SETPHASE|SETCHANNEL|SET|LOOP|JUMP|SAVE|LOAD'
+KAA_FAST_MAX_PARAMETERS = 5  # Parameters of the longest statement (SetPhase)
+
+# Values of the identifiers (uppercase), as given by the lexer
+KAA_FAST_IDENTIFIERS = {
+    **{f"CHAN{i}": i for i in range(8)},
+    "CHAN_ALL": 8,
+    **{f"PHASE{i}": i for i in range(16)},
+    # Global APU registers
+    "REG_CHAN_ENABLED": 0,
+    "REG_CHAN_LEFT": 1,
+    "REG_CHAN_RIGHT": 2,
+    "REG_MIX_VOLUME_A": 3,
+    "REG_MIX_VOLUME_B": 4,
+    "REG_MIX_FLAGS": 5,
+    # Channel registers
+    "REG_PHASE_IDS": 0,
+}
+
+
+def fastLinePattern() -> re.Pattern:
+    # A whole line: [OPCODE [parameter [, parameter]...]] [# comment], the tokens being atomic as in the PLY lexer
+    parameter = "((?>" + "|".join(KAA_FAST_PARAMETER_TOKENS) + "))"
+    parameters = ""
+    for _ in range(KAA_FAST_MAX_PARAMETERS - 1):
+        parameters = rf"(?:[ \t]*,[ \t]*{parameter}{parameters})?"
+    return re.compile(rf"[ \t]*(?:((?>{KAA_FAST_OPCODES}))[ \t]*(?:{parameter}{parameters})?)?[ \t]*(?:\#.*)?", re.IGNORECASE)
+
+
+def fastValue(text: str) -> int:
+    # Value of a parameter token
+    value = KAA_FAST_IDENTIFIERS.get(text.upper())
+    if value is not None:
+        return value
+    match text[:2].lower():
+        case "0b":
+            return int(text.replace('_', ''), 2)
+        case "0o":
+            return int(text, 8)
+        case "0x":
+            return int(text, 16)
+    return int(float(text))
+
+
+class KaaFastParser:
+    """Single-pass parser of KAA sources, an alternative to the PLY lexer and parser.
+
+    KAA is line oriented: each line is scanned by one regular expression, built from the table of
+    the tokens (KAA_FAST_PARAMETER_TOKENS, in the order of the PLY lexer rules), and gives the same
+    (opcode, parameters, line number) statements as the PLY parser, which stays the reference. A
+    source with a line the scanner does not accept (syntax error, illegal character, more than
+    KAA_FAST_MAX_PARAMETERS parameters) is handed over as a whole to the PLY parser, so the errors
+    are reported, and recovered from, the same way.
+    """
+
+    LINE = fastLinePattern()
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.fallbacks = 0  # Sources parsed by the PLY parser
+
+    def scan(self, code: str, firstLine: int = 1) -> list[tuple[str,list,int]]:
+        # Statements of the source (starting at line firstLine), None when a line is not accepted
+        statements = []
+        values = {}  # Parameter token -> value, the tokens repeat a lot
+        fullmatch = self.LINE.fullmatch
+        lines = code.split("\n")
+        last = firstLine + len(lines) - 1
+        for number, line in enumerate(lines, firstLine):
+            if number < last and line.endswith("\r"):
+                line = line[:-1]  # \r\n end of line
+            match = fullmatch(line)
+            if match is None:
+                self.logger.debug(f"Line {number} not scanned: {line!r}")
+                return None
+            opcode, *parameters = match.groups()
+            if opcode is not None:
+                params = []
+                for parameter in parameters:
+                    if parameter is None:
+                        break
+                    value = values.get(parameter)
+                    if value is None:
+                        value = values[parameter] = fastValue(parameter)
+                    params.append(value)
+                statements.append((opcode.upper(), params, number))
+        return statements
+
+    def parse(self, code: str, firstLine: int = 1) -> list[tuple[str,list,int]]:
+        statements = self.scan(code, firstLine)
+        if statements is None:
+            self.fallbacks += 1
+            statements = newKaaParser().parse(code, lexer=newKaaLexer(firstLine))
+        return statements
+
+
+def syntheticSource(lines: int) -> str:
+    # A machine-generated like source (phases, notes and syncs, some comments) of the given number of lines
+    statements = [
+        lambda i: f"SetPhase CHAN{i % 8}, PHASE{i % 16}, {i % 2048}, {'+' if i % 2 else '-'}255, 1",
+        lambda i: f"SetChannel CHAN{i % 8}, REG_PHASE_IDS, 0x{i % 4096:03X}  # Note {i}",
+        lambda i: f"Sync {i % 65536}",
+        lambda i: f"Set REG_CHAN_ENABLED, 0b{i % 256:08b}",
+        lambda i: f"Wait {i % 15}",
+    ]
+    return "\n".join(statements[i % len(statements)](i) for i in range(lines)) + "\n"
+
+
+def throughput(code: str, runs: int = 3) -> dict:
+    # Lines per second of the PLY and the fast parsers on the source (best of the runs), and whether they agree
+    import time
+
+    lines = len(code.splitlines())
+    fastParser = KaaFastParser()
+    parsers = {
+        "ply": lambda: newKaaParser().parse(code, lexer=newKaaLexer()),
+        "fast": lambda: fastParser.parse(code),
+    }
+    result = {"lines": lines}
+    statements = {}
+    for name, parse in parsers.items():
+        best = None
+        for _ in range(runs):
+            start = time.perf_counter()
+            statements[name] = parse()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result[name] = lines / best if best > 0 else float("inf")
+    result["speedup"] = result["fast"] / result["ply"]
+    result["fallbacks"] = fastParser.fallbacks
+    result["identical"] = statements["fast"] == statements["ply"]
+    return result
@@ -1,4 +1,3 @@
-import re
 import ply.lex as lex
 
 # Lexer for KAA (Konsolid8 Audio Assembly) language
@@ -20,7 +19,7 @@ import ply.lex as lex
 # - NUMBER:                             : 0b[01]+ | 0o[0-7]+ | [0-9]+(e[0-9]+) | 0x[0-9A-Fa-f]+
 # - ID_CHANNEL:     (case insensitive)  : CHAN[0-7] | CHAN_ALL
 # - ID_PHASE:       (case insensitive)  : PHASE[0-7]
-# - ID_REGISTER:    (case insensitive)  : REG_CHAN_ENABLED | REG_CHAN_LEFT | REG_CHAN_RIGHT | REG_PHASE_IDS
+# - ID_REGISTER:    (case insensitive)  : REG_CHAN_ENABLED | REG_CHAN_LEFT | REG_CHAN_RIGHT | REG_MIX_VOLUME_A | REG_MIX_VOLUME_B | REG_MIX_FLAGS | REG_PHASE_IDS
 # - OPCODE:         (case insensitive)  : WAIT | NOOP | SYNC | SET | SETPHASE | SETCHANNEL | LOOP | JUMP | SAVE | LOAD
 # - SEP:                                : ,
 # - EOL:                                : (\n|\r\n)+
@@ -48,7 +47,7 @@ t_SEP = r','
 def t_EOL(t:lex.LexToken):
     r'(\n|\r\n)+'
     t.type = 'EOL'
-    kaaLexer.lineno += t.value.count('\n')
+    t.lexer.lineno += t.value.count('\n')
     t.value = '\n'  # Normalize to a single newline character
     return t
 
@@ -106,13 +105,16 @@ def t_ID_PHASE(t):
 
 # RegisterId (value is the register number)
 def t_ID_REGISTER(t):
-    r'(REG_CHAN_ENABLED|REG_CHAN_LEFT|REG_CHAN_RIGHT|REG_PHASE_IDS)'
+    r'(REG_CHAN_ENABLED|REG_CHAN_LEFT|REG_CHAN_RIGHT|REG_MIX_VOLUME_A|REG_MIX_VOLUME_B|REG_MIX_FLAGS|REG_PHASE_IDS)'
     t.type = 'ID_REGISTER'
     register_map = {
         # Global APU registers
         'REG_CHAN_ENABLED': 0,
         'REG_CHAN_LEFT': 1,
         'REG_CHAN_RIGHT': 2,
+        'REG_MIX_VOLUME_A': 3,
+        'REG_MIX_VOLUME_B': 4,
+        'REG_MIX_FLAGS': 5,
         # Channel registers
         'REG_PHASE_IDS': 0,
     }
@@ -124,5 +126,4 @@ def t_error(t):
     print(f"Illegal character '{t.value[0]}' at line {t.lineno}")
     t.lexer.skip(1)
 
-# Build the lexer
-kaaLexer : lex.Lexer = lex.lex(reflags=re.IGNORECASE)  # Create the lexer with case insensitive matching
\ No newline at end of file
+# The lexer is built on first use, with case insensitive matching (see kaa_tables)
\ No newline at end of file
@@ -0,0 +1,13 @@
+# kaa_lextab.py. This file automatically created by PLY (version 3.11). Don't edit!
+_tabversion   = '3.10'
+_lextokens    = set(('EOL', 'ID_CHANNEL', 'ID_PHASE', 'ID_REGISTER', 'NUMBER', 'OPCODE', 'SEP'))
+_lexreflags   = 2
+_lexliterals  = ''
+_lexstateinfo = {'INITIAL': 'inclusive'}
+_lexstatere   = {'INITIAL': [('(?P<t_EOL>(\\n|\\r\\n)+)|(?P<t_NUMBER_BINARY>0b[01][01_]+)|(?P<t_NUMBER_OCTAL>0o[0-7]+)|(?P<t_NUMBER_HEXADECIMAL>0x[0-9A-Fa-f]+)|(?P<t_NUMBER_DECIMAL>[+-]?[0-9]+(e[0-9]+)?)|(?P<t_OPCODE>(NOOP|WAIT|SYNC|SETPHASE|SETCHANNEL|SET|LOOP|JUMP|SAVE|LOAD))|(?P<t_ID_CHANNEL>(CHAN[0-7]|CHAN_ALL))|(?P<t_ID_PHASE>(PHASE1[0-5]|PHASE[0-9]))|(?P<t_ID_REGISTER>(REG_CHAN_ENABLED|REG_CHAN_LEFT|REG_CHAN_RIGHT|REG_MIX_VOLUME_A|REG_MIX_VOLUME_B|REG_MIX_FLAGS|REG_PHASE_IDS))|(?P<t_ignore_COMMENT>\\#.*)|(?P<t_SEP>,)', [None, ('t_EOL', 'EOL'), None, ('t_NUMBER_BINARY', 'NUMBER_BINARY'), ('t_NUMBER_OCTAL', 'NUMBER_OCTAL'), ('t_NUMBER_HEXADECIMAL', 'NUMBER_HEXADECIMAL'), ('t_NUMBER_DECIMAL', 'NUMBER_DECIMAL'), None, ('t_OPCODE', 'OPCODE'), None, ('t_ID_CHANNEL', 'ID_CHANNEL'), None, ('t_ID_PHASE', 'ID_PHASE'), None, ('t_ID_REGISTER', 'ID_REGISTER'), None, (None, None), (None, 'SEP')])]}
+_lexstateignore = {'INITIAL': ' \t'}
+_lexstateerrorf = {'INITIAL': 't_error'}
+_lexstateeoff = {}
+
+_kaa_version = 1
+_kaa_signature = '871652014e90c4a1025226dab71e89cd27bf9dc0'
@@ -1,5 +1,3 @@
-import ply.yacc as yacc
-
 from .kaa_lexer import tokens
 
 def p_program(p):
@@ -22,10 +20,11 @@ def p_statement(p):
     '''statement : OPCODE parameter_list
                  | OPCODE
                  | empty'''
+    # (opcode, parameters, line number)
     if len(p) == 3:
-        p[0] = (p[1], p[2])
+        p[0] = (p[1], p[2], p.lineno(1))
     elif len(p) == 2 and p[1] != None:
-        p[0] = (p[1], [])
+        p[0] = (p[1], [], p.lineno(1))
     else:
         p[0] = None
 
@@ -37,7 +36,8 @@ def p_parameter_list(p):
     '''parameter_list : parameter_list SEP parameter
                       | parameter'''
     if len(p) == 4:
-        p[0] = p[1] + [p[3]]
+        p[0] = p[1]
+        p[0].append(p[3])
     else:
         p[0] = [p[1]]
 
@@ -52,5 +52,4 @@ def p_parameter(p):
 def p_error(p):
     print("Syntax error at token", p)
 
-# Build the parser
-kaaParser : yacc.LRParser = yacc.yacc()
\ No newline at end of file
+# The parser is built on first use (see kaa_tables)
\ No newline at end of file
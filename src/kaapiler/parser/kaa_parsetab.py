@@ -0,0 +1,46 @@
+
+# kaa_parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'EOL ID_CHANNEL ID_PHASE ID_REGISTER NUMBER OPCODE SEPprogram : statement_liststatement_list : statement_list EOL statement\n| statementstatement : OPCODE parameter_list\n| OPCODE\n| emptyempty :parameter_list : parameter_list SEP parameter\n| parameterparameter : NUMBER\n| ID_CHANNEL\n| ID_PHASE\n| ID_REGISTER'
+    
+_lr_action_items = {'OPCODE':([0,6,],[4,4,]),'EOL':([0,2,3,4,5,6,7,8,9,10,11,12,13,15,],[-7,6,-3,-5,-6,-7,-4,-9,-10,-11,-12,-13,-2,-8,]),'$end':([0,1,2,3,4,5,6,7,8,9,10,11,12,13,15,],[-7,0,-1,-3,-5,-6,-7,-4,-9,-10,-11,-12,-13,-2,-8,]),'NUMBER':([4,14,],[9,9,]),'ID_CHANNEL':([4,14,],[10,10,]),'ID_PHASE':([4,14,],[11,11,]),'ID_REGISTER':([4,14,],[12,12,]),'SEP':([7,8,9,10,11,12,15,],[14,-9,-10,-11,-12,-13,-8,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'program':([0,],[1,]),'statement_list':([0,],[2,]),'statement':([0,6,],[3,13,]),'empty':([0,6,],[5,5,]),'parameter_list':([4,],[7,]),'parameter':([4,14,],[8,15,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> program","S'",1,None,None,None),
+  ('program -> statement_list','program',1,'p_program','kaa_parser.py',4),
+  ('statement_list -> statement_list EOL statement','statement_list',3,'p_statement_list','kaa_parser.py',8),
+  ('statement_list -> statement','statement_list',1,'p_statement_list','kaa_parser.py',9),
+  ('statement -> OPCODE parameter_list','statement',2,'p_statement','kaa_parser.py',20),
+  ('statement -> OPCODE','statement',1,'p_statement','kaa_parser.py',21),
+  ('statement -> empty','statement',1,'p_statement','kaa_parser.py',22),
+  ('empty -> <empty>','empty',0,'p_empty','kaa_parser.py',32),
+  ('parameter_list -> parameter_list SEP parameter','parameter_list',3,'p_parameter_list','kaa_parser.py',36),
+  ('parameter_list -> parameter','parameter_list',1,'p_parameter_list','kaa_parser.py',37),
+  ('parameter -> NUMBER','parameter',1,'p_parameter','kaa_parser.py',45),
+  ('parameter -> ID_CHANNEL','parameter',1,'p_parameter','kaa_parser.py',46),
+  ('parameter -> ID_PHASE','parameter',1,'p_parameter','kaa_parser.py',47),
+  ('parameter -> ID_REGISTER','parameter',1,'p_parameter','kaa_parser.py',48),
+]
+
+_kaa_version = 1
+_kaa_signature = 'e8578c562c38a330345914ee4fcfb364f92e11ff'
@@ -0,0 +1,204 @@
+import copy
+import hashlib
+import importlib
+import inspect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Prebuilt PLY tables of the KAA lexer and parser, shipped in this package (kaa_lextab.py and kaa_parsetab.py).
+#
+# Building the lexer (validation of the rules, master regex) and the parser (LALR tables) takes most of the
+# kaapiler start-up: the tables are generated once (python -m kaapiler.parser build) and loaded on
+# the first compilation. Each table module records the version of its format and a signature of the rules it was
+# generated from: missing or outdated tables are rebuilt in memory (with a warning), nothing is ever written at
+# run time, neither in the package nor in the working directory.
+
+KAA_TABLES_VERSION = 1                # Format of the table modules, bumped when it changes
+KAA_LEXER_FLAGS = re.IGNORECASE       # Regex flags of the lexer rules
+KAA_LEXTAB = "kaa_lextab"             # Module of the lexer tables
+KAA_PARSETAB = "kaa_parsetab"         # Module of the parser tables
+KAA_STARTUP_BUDGET = 0.15             # Seconds: kaapiler start-up, compilation of a one line file included
+
+logger = logging.getLogger(__name__)
+
+_lexer = None
+_parser = None
+_lock = threading.Lock()
+
+
+def rulesSignature(module, prefix: str, flags: int = 0) -> str:
+    # Hash of the tokens and the rules (name and pattern or production, in PLY's order) of a lexer (t_) or parser (p_) module.
+    # The docstrings are cleaned up: their indentation is kept or stripped depending on the Python version.
+    strings = []
+    functions = []
+    for name, value in vars(module).items():
+        if not name.startswith(prefix):
+            continue
+        if isinstance(value, str):
+            strings.append(f"{name}={value}")
+        elif callable(value):
+            functions.append((value.__code__.co_firstlineno, f"{name}={inspect.cleandoc(value.__doc__ or '')}"))
+    parts = [str(KAA_TABLES_VERSION), str(int(flags)), " ".join(module.tokens)] + sorted(strings) + [rule for _, rule in sorted(functions)]
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()
+
+
+def loadTables(name: str, signature: str, plyVersion: str):
+    # The prebuilt table module, None when it is missing or outdated
+    try:
+        tables = importlib.import_module(f"{__package__}.{name}")
+    except ImportError:
+        logger.warning(f"No prebuilt {name} tables, building them (see python -m kaapiler.parser build)")
+        return None
+    if getattr(tables, "_kaa_version", None) != KAA_TABLES_VERSION or getattr(tables, "_kaa_signature", None) != signature or getattr(tables, "_tabversion", None) != plyVersion:
+        logger.warning(f"Outdated {name} tables, building them (see python -m kaapiler.parser build)")
+        return None
+    return tables
+
+
+def buildLexer(prebuilt: bool = True):
+    from ply import lex
+
+    from . import kaa_lexer
+
+    lextab = loadTables(KAA_LEXTAB, rulesSignature(kaa_lexer, "t_", KAA_LEXER_FLAGS), lex.__tabversion__) if prebuilt else None
+    if lextab is not None:
+        return lex.lex(module=kaa_lexer, reflags=KAA_LEXER_FLAGS, optimize=True, lextab=lextab, errorlog=logger)
+    return lex.lex(module=kaa_lexer, reflags=KAA_LEXER_FLAGS, errorlog=logger)
+
+
+def buildParser(prebuilt: bool = True):
+    from ply import yacc
+
+    from . import kaa_parser
+
+    parsetab = loadTables(KAA_PARSETAB, rulesSignature(kaa_parser, "p_"), yacc.__tabversion__) if prebuilt else None
+    if parsetab is not None:
+        return yacc.yacc(module=kaa_parser, tabmodule=parsetab, optimize=True, write_tables=False, debug=False, errorlog=logger)
+    # A table module name PLY cannot import: the tables are generated
+    return yacc.yacc(module=kaa_parser, tabmodule=f"{__package__}.{KAA_PARSETAB}_none", write_tables=False, debug=False, errorlog=logger)
+
+
+def prebuiltTables() -> bool:
+    # Whether both prebuilt table modules are up to date (else they are rebuilt in memory on first use)
+    from ply import lex, yacc
+
+    from . import kaa_lexer, kaa_parser
+
+    lextab = loadTables(KAA_LEXTAB, rulesSignature(kaa_lexer, "t_", KAA_LEXER_FLAGS), lex.__tabversion__)
+    parsetab = loadTables(KAA_PARSETAB, rulesSignature(kaa_parser, "p_"), yacc.__tabversion__)
+    return lextab is not None and parsetab is not None
+
+
+def getKaaLexer():
+    # The shared lexer, built on first use (see newKaaLexer to lex concurrently)
+    global _lexer
+    if _lexer is None:
+        with _lock:
+            if _lexer is None:
+                _lexer = buildLexer()
+    return _lexer
+
+
+def getKaaParser():
+    # The shared parser, built on first use (see newKaaParser to parse concurrently)
+    global _parser
+    if _parser is None:
+        with _lock:
+            if _parser is None:
+                _parser = buildParser()
+    return _parser
+
+
+def newKaaLexer(lineno: int = 1):
+    # A lexer of its own (input, position, line number of the first line), sharing the rules of the shared lexer
+    lexer = getKaaLexer().clone()
+    lexer.lineno = lineno
+    return lexer
+
+
+def newKaaParser():
+    # A parser of its own (parsing stacks), sharing the tables of the shared parser
+    return copy.copy(getKaaParser())
+
+
+def writeTables(outputdir: str = None) -> list[str]:
+    # Generate the table modules (into this package by default), return their paths
+    from ply import lex, yacc
+
+    from . import kaa_lexer, kaa_parser
+
+    outputdir = outputdir or os.path.dirname(__file__)
+    paths = [os.path.join(outputdir, name + ".py") for name in [KAA_LEXTAB, KAA_PARSETAB]]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)  # PLY keeps up-to-date parser tables
+    importlib.invalidate_caches()
+
+    lexer = lex.lex(module=kaa_lexer, reflags=KAA_LEXER_FLAGS, errorlog=logger)
+    lexer.writetab(KAA_LEXTAB, outputdir)
+    yacc.yacc(module=kaa_parser, tabmodule=f"{__package__}.{KAA_PARSETAB}", outputdir=outputdir, debug=False, errorlog=logger)
+    signatures = [rulesSignature(kaa_lexer, "t_", KAA_LEXER_FLAGS), rulesSignature(kaa_parser, "p_")]
+    for path, signature in zip(paths, signatures):
+        if not os.path.exists(path):
+            raise IOError(f"Tables not written: '{path}'")
+        with open(path, "at") as f:
+            f.write(f"\n_kaa_version = {KAA_TABLES_VERSION!r}\n_kaa_signature = {signature!r}\n")
+    return paths
+
+
+def benchmark(runs: int = 10, budget: float = KAA_STARTUP_BUDGET) -> dict:
+    # Start-up of the kaapiler CLI in fresh interpreters: imports, tables, compilation of a one line file and output
+    import subprocess
+    import tempfile
+
+    package = Path(__file__).parent
+    root = str(package.parent.parent)  # Directory of the kaapiler package
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([root] + [p for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p])}
+    before = sorted(p.name for p in package.iterdir())
+    with tempfile.TemporaryDirectory() as directory:
+        source = Path(directory) / "startup.kaa"
+        source.write_text("Wait 1\n")
+        output = Path(directory) / "startup.bin"
+        cwd = Path(directory) / "cwd"
+        cwd.mkdir()
+        commands = {
+            "interpreter": [sys.executable, "-c", "pass"],
+            "kaapiler": [sys.executable, "-c", "from kaapiler.__main__ import main; main()", str(source), "-o", str(output)],
+        }
+        times = {name: [] for name in commands}
+        for _ in range(runs):
+            for name, command in commands.items():
+                start = time.perf_counter()
+                subprocess.run(command, cwd=cwd, env=env, check=True)
+                times[name].append(time.perf_counter() - start)
+        written = sorted(p.name for p in cwd.iterdir())
+    written += [name for name in sorted(p.name for p in package.iterdir()) if name not in before]
+
+    # In this process: tables loading against tables generation
+    prebuilt = prebuiltTables()
+    start = time.perf_counter()
+    buildLexer(), buildParser()
+    loading = time.perf_counter() - start
+    start = time.perf_counter()
+    buildLexer(prebuilt=False), buildParser(prebuilt=False)
+    generated = time.perf_counter() - start
+
+    startup = sorted(times["kaapiler"])[len(times["kaapiler"]) // 2]
+    return {
+        "runs": runs,
+        "budget": budget,
+        "startup": startup,
+        "startupBest": min(times["kaapiler"]),
+        "interpreter": sorted(times["interpreter"])[runs // 2],
+        "prebuilt": prebuilt,
+        "tablesLoading": loading,
+        "tablesGeneration": generated,
+        "written": written,
+        "ok": startup <= budget and not written and prebuilt,
+    }
+
@@ -1,21 +1,34 @@
 import argparse
+from collections.abc import Iterable
+import json
 import logging
-import wave
-import numpy as np
-import sounddevice as sd
-import matplotlib.pyplot as plt
+import time
 from pathlib import Path
 
 from ..core.apu import Apu
+from ..core.apu_checkpoints import ApuCheckpoints
+from ..core.apu_constants import APU_CHECKPOINT_INTERVAL, APU_CLOCK_FREQUENCY, APU_RENDER_CACHE_SIZE
+from ..core.apu_profiler import ApuProfiler
+from ..core.apu_render_cache import ApuRenderCache
+from ..core.apu_sample_buffer import ApuSampleBuffer
+from ..core.apu_stats import ApuStats
+from ..core.apu_trace import ApuTraceLogger, ApuTraceRecorder
+from ..playback import LivePlayer
+from ..sinks import SINKS, OutputSink, create_sink
 
 
 class Application:
-    OUTPUT_FORMAT_WAV = "wav"
-    OUTPUT_FORMAT_SOUND = "sound"
-    OUTPUT_FORMAT_PLOT = "plot"
+    OUTPUT_FORMAT_LIVE = "live"  # The other formats are output sinks (see kapusim.sinks)
+    CYCLES_AUTO = "auto"
 
     def __init__(self):
         self.logger = None
+        self.recorder = None
+        self.stats = None
+        self.profiler = None
+        self.checkpoints = None
+        self.cache = None
+        self.start_sample = 0
 
     def configure_logger(self, debug_level: str):
         logging.basicConfig(level=getattr(logging, debug_level, logging.ERROR))
@@ -24,17 +37,58 @@ class Application:
     def parse_arguments(self, args: list[str]) -> argparse.Namespace:
         parser = argparse.ArgumentParser(description="KAPU Simulator CLI Application")
         parser.add_argument("input_file", type=str, help="Path to the binary input file")
-        parser.add_argument("-c", "--cycles", type=int, default=44100*16, help="Number of APU cycles to run (default: 44100x16 = 1s)")
-        parser.add_argument("-f", "--output-format", type=str, choices=["wav", "sound", "plot"], default="sound", help="Output format (WAV file, SOUND playback, or PLOT waveform)")
-        parser.add_argument("-o", "--output-file", type=str, default=None, help="Output filename (if WAV format is used)")
-        parser.add_argument("-r", "--sample-rate", type=int, default=44100, help="Sample rate for audio (default: 44100)")
+        parser.add_argument("-c", "--cycles", type=self.parse_cycles, default=44100*16, help="Number of APU cycles to run, or 'auto' for the exact duration of the program (default: 44100x16 = 1s)")
+        parser.add_argument("-f", "--output-format", type=str, choices=list(SINKS) + [self.OUTPUT_FORMAT_LIVE], default="sound", help="Output format (WAV file, SOUND playback, PLOT waveform, RAW PCM file, NPY array file, NULL for benchmarks, or LIVE playback while rendering)")
+        parser.add_argument("-o", "--output-file", type=str, default=None, help="Output filename (WAV, RAW and NPY formats)")
+        parser.add_argument("-r", "--sample-rate", type=int, default=None, help=f"Sample rate of the output (default: the APU one, {APU_CLOCK_FREQUENCY}Hz / --apu-ratio)")
+        parser.add_argument("--bits", type=int, choices=[8, 16], default=8, help="Bits per sample of the WAV, RAW, NPY and SOUND outputs: unsigned 8-bit as rendered, or signed 16-bit (default: 8)")
         parser.add_argument("-x", "--apu-ratio", type=int, default=16, help="Number of APU cycles per Sample (default: 16)")
+        parser.add_argument("-k", "--chunk-size", type=int, default=None, help="Render and output the samples by chunks of this number of frames (bounded memory)")
+        parser.add_argument("-l", "--latency", type=float, default=0.1, help="LIVE playback: buffered sound, in seconds (default: 0.1)")
+        parser.add_argument("-b", "--block-size", type=int, default=512, help="LIVE playback: frames per audio callback (default: 512)")
+        parser.add_argument("-e", "--engine", type=str, choices=Apu.ENGINES, default=Apu.ENGINE_EVENT, help="APU engine: cycle-by-cycle reference, or event-driven fast-forward (default: event)")
+        parser.add_argument("-t", "--trace-file", type=str, default=None, help="Record the APU events (commands, phases, loops, jumps) into this binary trace file")
+        parser.add_argument("-s", "--stats", type=str, choices=["text", "json"], default=None, help="Print the APU statistics (opcode counts, NOOP cycles, phase copies, wall time split) at the end of the run")
+        parser.add_argument("-p", "--profile", action="store_true", help="Print the hot-spot table: cycles and samples per command (per KAA line with --source-map)")
+        parser.add_argument("-m", "--source-map", type=str, default=None, help="PROFILE: source map written by the compiler (kaapiler --source_map)")
+        parser.add_argument("--profile-folded", type=str, default=None, help="PROFILE: export the profile in the flamegraph folded format to this file")
+        parser.add_argument("-j", "--jobs", type=int, default=1, help="Render the song in time slices over this number of processes (same output as a single process)")
+        parser.add_argument("-P", "--pipeline", action="store_true", help="Render in two stages: the commands first, then each channel on its own (over --jobs processes)")
+        parser.add_argument("--schedule-file", type=str, default=None, help="PIPELINE: write the register writes of each channel and of the mixer into this JSON file (implies --pipeline)")
+        parser.add_argument("--cache-dir", type=str, default=None, help="Render cache directory: a render already done with the same program and parameters is read from there instead of simulated")
+        parser.add_argument("--cache-size", type=int, default=APU_RENDER_CACHE_SIZE >> 20, help=f"CACHE: maximum size of the cache directory, in MiB (default: {APU_RENDER_CACHE_SIZE >> 20})")
+        parser.add_argument("-S", "--start", type=float, default=0.0, help="Start the output at this time of the song, in seconds at the APU sample rate whatever --sample-rate (the APU seeks there from the nearest checkpoint)")
+        parser.add_argument("--checkpoints", type=str, default=None, help="Checkpoint file: loaded to seek right away, and updated with the checkpoints taken during the run")
+        parser.add_argument("--checkpoint-interval", type=int, default=APU_CHECKPOINT_INTERVAL, help=f"Samples between two checkpoints (default: {APU_CHECKPOINT_INTERVAL})")
         parser.add_argument("-d", "--debug-level", type=str, choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], default="ERROR", help="Debugging level")
         parsed_args = parser.parse_args(args)
         if self.logger:
             self.logger.debug(f"Parsed arguments: {parsed_args}")
         return parsed_args
 
+    def parse_cycles(self, value: str):
+        if value == self.CYCLES_AUTO:
+            return value
+        return int(value)
+
+    def analyze_cycles(self, data: bytes, ratio: int) -> int:
+        # Cycles to the end of the program, or to the end of the first iteration of an infinite loop
+        from kaapiler.core.kaa_analyzer import KaaAnalyzer  # Only needed here
+        analysis = KaaAnalyzer(ratio).analyze(data)
+        if analysis.infinite:
+            self.logger.warning(f"{analysis}, rendering up to the end of its first iteration")
+        self.logger.info(f"Program duration: {analysis}")
+        return analysis.cycles
+
+    def check_sample_rate(self, sample_rate: int, ratio: int) -> int:
+        # The APU outputs one sample every ratio cycles: its sample rate depends on the ratio
+        apu_rate = round(APU_CLOCK_FREQUENCY / ratio)
+        if sample_rate is None:
+            return apu_rate
+        if sample_rate != apu_rate:
+            self.logger.warning(f"Sample rate of {sample_rate}Hz for an APU sample rate of {apu_rate}Hz (ratio {ratio}): played at {sample_rate / apu_rate:.3f}x speed")
+        return sample_rate
+
     def read_input_file(self, input_file: str) -> bytes:
         input_path = Path(input_file)
         if not input_path.exists():
@@ -43,63 +97,175 @@ class Application:
         with input_path.open("rb") as f:
             return f.read()
 
-    def run_apu(self, data: bytes, cycles: int, ratio: int) -> list[tuple[int, int]]:
-        apu = Apu(apuRatio=ratio)
+    def load_checkpoints(self, checkpoints_file: str, interval: int, ratio: int) -> ApuCheckpoints:
+        if checkpoints_file and Path(checkpoints_file).exists():
+            checkpoints = ApuCheckpoints.load(checkpoints_file)
+            self.logger.info(f"{len(checkpoints)} checkpoints loaded from '{checkpoints_file}'.")
+            return checkpoints
+        return ApuCheckpoints(interval, ratio)
+
+    def save_checkpoints(self, checkpoints_file: str):
+        self.checkpoints.save(checkpoints_file)
+        self.logger.info(f"{len(self.checkpoints)} checkpoints written to '{checkpoints_file}'.")
+
+    def create_apu(self, data: bytes, ratio: int, engine: str) -> Apu:
+        apu = Apu(apuRatio=ratio, engine=engine)
+        # Seek before attaching the subscribers: the skipped part of the song is neither traced nor counted
+        if self.checkpoints is not None:
+            self.checkpoints.attach(apu)
+            if self.start_sample:
+                self.checkpoints.seek(apu, data, self.start_sample)
+        # The trace subscribers are only attached when needed: without them, the hooks cost nothing
+        if logging.getLogger(Apu.__module__).isEnabledFor(logging.INFO):
+            ApuTraceLogger(apu.logger).attach(apu.trace)
+        if self.recorder:
+            self.recorder.attach(apu.trace)
+        if self.stats:
+            self.stats.attach(apu)
+        if self.profiler:
+            self.profiler.attach(apu)
+        return apu
+
+    def run_apu(self, data: bytes, cycles: int, ratio: int, engine: str = Apu.ENGINE_EVENT) -> ApuSampleBuffer:
+        apu = self.create_apu(data, ratio, engine)
         return apu.run(data, cycles)
 
-    def write_wav_file(self, samples: list[tuple[int, int]], output_file: str, sample_rate: int):
-        with wave.open(output_file, "w") as wav_file:
-            wav_file.setnchannels(2)  # Stereo
-            wav_file.setsampwidth(1)  # 8-bit samples
-            wav_file.setframerate(sample_rate)
-            wav_data = bytearray()
-            for left, right in samples:
-                wav_data.append(left)
-                wav_data.append(right)
-            wav_file.writeframes(wav_data)
-        self.logger.info(f"WAV file written to '{output_file}'.")
-
-    def play_sound(self, samples: list[tuple[int, int]], sample_rate: int):
-        left = np.array([(s[0] - 128) / 128 for s in samples], dtype=np.float32)
-        right = np.array([(s[1] - 128) / 128 for s in samples], dtype=np.float32)
-        stereo = np.stack([left, right], axis=1)
-        self.logger.info("Playing sound...")
-        sd.play(stereo, samplerate=sample_rate)
-        sd.wait()
-
-    def plot_waveform(self, samples: list[tuple[int, int]]):
-        left = np.array([(s[0] - 128) / 128 for s in samples], dtype=np.float32)
-        right = np.array([(s[1] - 128) / 128 for s in samples], dtype=np.float32)
-
-        plt.figure(figsize=(10, 4))
-        plt.plot(left, label="Left Channel", linewidth=1.0)
-        plt.plot(right, label="Right Channel", linewidth=1.0)
-        plt.title("Waveform")
-        plt.xlabel("Sample Index")
-        plt.ylabel("Amplitude")
-        plt.legend()
-        plt.grid(True)
-        plt.tight_layout()
-        plt.show()
-
-    def run(self, args: list[str]):
+    def render_parallel(self, data: bytes, cycles: int, ratio: int, engine: str, jobs: int) -> ApuSampleBuffer:
+        from ..core.apu_parallel import ApuParallelRenderer  # Multiprocessing only imported by the renders using it
+        apu = self.create_apu(data, ratio, engine)
+        with ApuParallelRenderer(jobs, ratio, engine) as renderer:
+            return renderer.render(data, cycles, apu)
+
+    def render_pipeline(self, data: bytes, cycles: int, ratio: int, engine: str, jobs: int, schedule_file: str = None) -> ApuSampleBuffer:
+        from concurrent.futures import ProcessPoolExecutor
+        from ..core.apu_pipeline import ApuPipeline
+        apu = self.create_apu(data, ratio, engine)
+        executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        try:
+            pipeline = ApuPipeline(ratio, executor)
+            samples = pipeline.render(data, cycles, apu)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if schedule_file:
+            pipeline.schedule.save(schedule_file)
+            self.logger.info(f"Schedule of {len(pipeline.schedule)} register writes written to '{schedule_file}'.")
+        return samples
+
+    def stream_apu(self, data: bytes, cycles: int, ratio: int, engine: str, chunk_size: int) -> Iterable[ApuSampleBuffer]:
+        apu = self.create_apu(data, ratio, engine)
+        return apu.stream(data, cycles, chunk_size)
+
+    def save_trace(self, trace_file: str):
+        self.recorder.save(trace_file)
+        self.logger.info(f"Trace of {min(self.recorder.count, self.recorder.capacity)}/{self.recorder.count} events written to '{trace_file}'.")
+
+    def print_stats(self, stats_format: str, total_time: float, sample_rate: int):
+        report = self.stats.report(total_time, sample_rate)
+        if stats_format == "json":
+            print(json.dumps(report, indent=2))
+        else:
+            print(ApuStats.format(report))
+
+    def play_live(self, data: bytes, cycles: int, ratio: int, engine: str, sample_rate: int, block_size: int, latency: float):
+        player = LivePlayer(self.create_apu(data, ratio, engine), data, cycles, sample_rate, block_size, latency)
+        self.logger.info("Playing live...")
+        player.play()
+        self.logger.info(f"Live playback statistics: {player.statistics()}")
+
+    def write_output(self, chunks: Iterable[ApuSampleBuffer], sink: OutputSink):
+        # The chunks go to the sink as they are rendered
+        with sink:
+            for chunk in chunks:
+                sink.write(chunk)
+
+    def print_profile(self, profile_folded: str):
+        rows = self.profiler.hotSpots()
+        print(self.profiler.format(rows))
+        if profile_folded:
+            with open(profile_folded, "wt") as f:
+                f.write(self.profiler.folded(rows))
+            self.logger.info(f"Folded profile written to '{profile_folded}'.")
+
+    def render(self, data: bytes, arguments: argparse.Namespace) -> Iterable:
+        # Chunks of samples, rendered as requested by the arguments
+        arguments.pipeline = arguments.pipeline or bool(arguments.schedule_file)
+        if (arguments.jobs > 1 or arguments.pipeline) and (self.recorder or self.stats or self.profiler):
+            self.logger.warning("Tracing, statistics and profiling need a single process run, --jobs and --pipeline ignored")
+            arguments.jobs = 1
+            arguments.pipeline = False
+        if arguments.pipeline:
+            if arguments.chunk_size:
+                self.logger.warning("Pipeline rendering outputs the whole song at once, --chunk-size ignored")
+            return [self.render_pipeline(data, arguments.cycles, arguments.apu_ratio, arguments.engine, arguments.jobs, arguments.schedule_file)]
+        if arguments.jobs > 1:
+            if arguments.chunk_size:
+                self.logger.warning("Parallel rendering outputs the whole song at once, --chunk-size ignored")
+            return [self.render_parallel(data, arguments.cycles, arguments.apu_ratio, arguments.engine, arguments.jobs)]
+        if arguments.chunk_size:
+            return self.stream_apu(data, arguments.cycles, arguments.apu_ratio, arguments.engine, arguments.chunk_size)
+        return [self.run_apu(data, arguments.cycles, arguments.apu_ratio, arguments.engine)]
+
+    def cached_render(self, data: bytes, arguments: argparse.Namespace) -> Iterable:
+        # Traced, counted or profiled runs are never read from the cache: the simulation is what they are about
+        self.cache = ApuRenderCache(arguments.cache_dir, arguments.cache_size << 20)
+        key = self.cache.key(data, cycles=arguments.cycles, ratio=arguments.apu_ratio, start=self.start_sample)
+        samples = self.cache.get(key)
+        if samples is not None:
+            self.logger.info(f"Render cache hit: {key}")
+            return [samples]
+        self.logger.info(f"Render cache miss: {key}")
+        return self.cache.store(key, self.render(data, arguments))
+
+    def finish(self, arguments: argparse.Namespace, total_time: float):
+        if self.cache:
+            self.logger.info(f"Render cache statistics: {self.cache.statistics()}")
+        if arguments.checkpoints:
+            self.save_checkpoints(arguments.checkpoints)
+        if self.recorder:
+            self.save_trace(arguments.trace_file)
+        if self.stats:
+            self.print_stats(arguments.stats, total_time, arguments.sample_rate)
+        if self.profiler:
+            self.print_profile(arguments.profile_folded)
+
+    def run(self, args: list[str]) -> OutputSink:
+        if args[:1] == ["batch"]:
+            from .batch import BatchApplication
+            return BatchApplication().run(args[1:])
         try:
             arguments = self.parse_arguments(args)
             self.configure_logger(arguments.debug_level)
             input_data = self.read_input_file(arguments.input_file)
-            samples = self.run_apu(input_data, arguments.cycles, arguments.apu_ratio)
-
-            if arguments.output_format == self.OUTPUT_FORMAT_WAV:
-                if not arguments.output_file:
-                    raise ValueError("Output filename must be specified for WAV format.")
-                self.write_wav_file(samples, arguments.output_file, arguments.sample_rate)
-            elif arguments.output_format == self.OUTPUT_FORMAT_SOUND:
-                self.play_sound(samples, arguments.sample_rate)
-            elif arguments.output_format == self.OUTPUT_FORMAT_PLOT:
-                self.plot_waveform(samples)
+            arguments.sample_rate = self.check_sample_rate(arguments.sample_rate, arguments.apu_ratio)
+            if arguments.cycles == self.CYCLES_AUTO:
+                arguments.cycles = self.analyze_cycles(input_data, arguments.apu_ratio)
+            if arguments.start or arguments.checkpoints:
+                self.checkpoints = self.load_checkpoints(arguments.checkpoints, arguments.checkpoint_interval, arguments.apu_ratio)
+                self.start_sample = int(arguments.start * APU_CLOCK_FREQUENCY / arguments.apu_ratio)  # Song time: at the APU sample rate, whatever the output one
+                arguments.cycles = max(arguments.cycles - self.start_sample * arguments.apu_ratio, 0)  # What is left after the start
+            frame_count = -(-arguments.cycles // arguments.apu_ratio)  # One sample every apu_ratio cycles, from cycle 0
+            if arguments.trace_file:
+                self.recorder = ApuTraceRecorder()
+            if arguments.stats:
+                self.stats = ApuStats()
+            if arguments.profile or arguments.profile_folded:
+                self.profiler = ApuProfiler.load(arguments.source_map)
+            start = time.perf_counter()
+            if arguments.output_format == self.OUTPUT_FORMAT_LIVE:
+                self.play_live(input_data, arguments.cycles, arguments.apu_ratio, arguments.engine, arguments.sample_rate, arguments.block_size, arguments.latency)
+                self.finish(arguments, time.perf_counter() - start)
+                return None
+
+            sink = create_sink(arguments.output_format, output_file=arguments.output_file, sample_rate=arguments.sample_rate, frames=frame_count, sample_width=arguments.bits // 8)
+            if arguments.cache_dir and not (self.recorder or self.stats or self.profiler or arguments.schedule_file):
+                chunks = self.cached_render(input_data, arguments)
             else:
-                self.logger.error(f"Unsupported output format: {arguments.output_format}")
-                raise ValueError(f"Unsupported output format: {arguments.output_format}")
+                chunks = self.render(input_data, arguments)
+
+            self.write_output(chunks, sink)
+            self.finish(arguments, time.perf_counter() - start)
+            return sink
         except Exception as e:
             if self.logger:
                 self.logger.error(f"An error occurred: {e}")
@@ -0,0 +1,149 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import importlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from ..sinks import SINKS, sink_class
+
+
+def warm_up(analyzer: bool):
+    # Worker initializer: the modules are imported for their side effect only, so the imports (and the compiler, for --cycles auto) are paid once per worker
+    importlib.import_module("kapusim.cli.application")
+    if analyzer:
+        importlib.import_module("kaapiler.core.kaa_analyzer")
+
+
+def cycles_auto(args: list[str]) -> bool:
+    # Whether the render options ask for --cycles auto (the last --cycles/-c wins, as with argparse)
+    cycles = None
+    for i, arg in enumerate(args):
+        if arg in ["-c", "--cycles"] and i + 1 < len(args):
+            cycles = args[i + 1]
+        elif arg.startswith("--cycles="):
+            cycles = arg.split("=", 1)[1]
+        elif arg.startswith("-c") and not arg.startswith("--") and len(arg) > 2:
+            cycles = arg[2:]
+    return cycles == "auto"
+
+
+def render_job(input_file: str, output_format: str, output_file: str, args: list[str]) -> dict:
+    # Worker: one input rendered by the regular CLI into a file
+    from .application import Application
+    result = {"input": input_file, "output": output_file}
+    start = time.perf_counter()
+    try:
+        sink = Application().run([input_file, "-f", output_format, "-o", output_file] + args)
+        result["frames"] = sink.written
+        result["duration"] = sink.written / sink.sample_rate
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class BatchApplication:
+    """kapusim batch: renders many programs into files with a pool of worker processes.
+
+    The inputs are globs and/or a JSON manifest: a list of input paths, or of objects
+    {"input": path, "output": path (optional), "args": [per input options] (optional)}, the input
+    paths being relative to the manifest. The output files are named after the inputs, with the
+    extension of the output format (file sinks only: wav, raw, npy, or null to benchmark). The
+    options unknown to the batch command are passed to each render (see Application: --cycles...).
+    The workers are kept for all the inputs, so the imports and the setup are paid once per worker.
+    A JSON summary (per input duration, frames and errors, total throughput) is printed or saved.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def parse_arguments(self, args: list[str]) -> tuple[argparse.Namespace, list[str]]:
+        parser = argparse.ArgumentParser(prog="kapusim batch", description="KAPU Simulator batch rendering: one output file per input (other options are passed to each render)")
+        parser.add_argument("inputs", type=str, nargs="*", help="Binary input files, or glob patterns ('**' for the subdirectories)")
+        parser.add_argument("-M", "--manifest", type=str, default=None, help="JSON manifest: list of input paths, or of {input, output, args} objects")
+        parser.add_argument("-f", "--output-format", type=str, choices=[name for name in SINKS if name not in ["sound", "plot"]], default="wav", help="Output format of each input (default: wav)")
+        parser.add_argument("-O", "--output-dir", type=str, default=".", help="Directory of the output files named after the inputs (default: current directory)")
+        parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="Number of worker processes (default: number of CPUs)")
+        parser.add_argument("-d", "--debug-level", type=str, choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], default="ERROR", help="Debugging level (also passed to each render)")
+        parser.add_argument("--summary", type=str, default=None, help="Write the JSON summary into this file instead of printing it")
+        return parser.parse_known_args(args)
+
+    def collect_jobs(self, arguments: argparse.Namespace, args: list[str]) -> list[tuple[str, str, str, list[str]]]:
+        # (input, output format, output, render options) of each input
+        entries = []
+        for pattern in arguments.inputs:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            if not matches:
+                self.logger.warning(f"No input file matches '{pattern}'")
+            entries += [{"input": path} for path in matches]
+        if arguments.manifest:
+            with open(arguments.manifest, "rt") as f:
+                manifest = json.load(f)
+            base = Path(arguments.manifest).parent
+            for entry in manifest:
+                entry = {"input": entry} if isinstance(entry, str) else entry
+                entries.append({**entry, "input": str(base / entry["input"])})
+        output_dir = Path(arguments.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        extension = sink_class(arguments.output_format).EXTENSION or ""
+        jobs = []
+        outputs = set()
+        for entry in entries:
+            output = entry.get("output") or str(output_dir / (Path(entry["input"]).stem + extension))
+            if output in outputs and extension:
+                self.logger.warning(f"'{entry['input']}' overwrites the output of another input: '{output}'")
+            outputs.add(output)
+            jobs.append((entry["input"], arguments.output_format, output, args + entry.get("args", []) + ["-d", arguments.debug_level]))
+        return jobs
+
+    def render(self, jobs: list[tuple[str, str, str, list[str]]], workers: int) -> list[dict]:
+        results = []
+        analyzer = any(cycles_auto(args) for *_, args in jobs)
+        with ProcessPoolExecutor(max_workers=workers, initializer=warm_up, initargs=(analyzer,)) as executor:
+            futures = [executor.submit(render_job, *job) for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                if "error" in result:
+                    self.logger.error(f"{result['input']}: {result['error']}")
+                else:
+                    self.logger.info(f"{result['input']} -> {result['output']} ({result['seconds']:.3f}s)")
+                results.append(result)
+        return sorted(results, key=lambda result: result["input"])
+
+    def summary(self, results: list[dict], workers: int, total_time: float) -> dict:
+        rendered = [result for result in results if "error" not in result]
+        frames = sum(result["frames"] for result in rendered)
+        duration = sum(result["duration"] for result in rendered)
+        return {
+            "inputs": len(results),
+            "rendered": len(rendered),
+            "failed": len(results) - len(rendered),
+            "workers": workers,
+            "wallTime": total_time,
+            "frames": frames,
+            "duration": duration,
+            "framesPerSecond": frames / total_time if total_time > 0 else 0.0,
+            "realTimeFactor": duration / total_time if total_time > 0 else 0.0,
+            "results": results,
+        }
+
+    def run(self, args: list[str]) -> dict:
+        arguments, render_args = self.parse_arguments(args)
+        logging.basicConfig(level=getattr(logging, arguments.debug_level, logging.ERROR))
+        jobs = self.collect_jobs(arguments, render_args)
+        if not jobs:
+            raise ValueError("No input file to render")
+        workers = max(min(arguments.workers or 1, len(jobs)), 1)
+        start = time.perf_counter()
+        results = self.render(jobs, workers)
+        summary = self.summary(results, workers, time.perf_counter() - start)
+        if arguments.summary:
+            with open(arguments.summary, "wt") as f:
+                json.dump(summary, f, indent=2)
+        else:
+            print(json.dumps(summary, indent=2))
+        return summary
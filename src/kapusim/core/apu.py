@@ -1,12 +1,38 @@
 import logging
+import struct
+import numpy as np
+
 from .apu_channel import ApuChannel
-from .apu_channel_phase import ApuChannelPhase
+from .apu_mixer import ApuMixer
+from .apu_period_cache import ApuPeriodCache
+from .apu_phase_table import ApuPhaseTable
+from .apu_sample_buffer import ApuSampleBuffer
+from .apu_trace import ApuTrace
+from .apu_translator import ApuTranslator
 from .apu_constants import *
 
 class Apu:
-    def __init__(self, apuRatio=16):
+    ENGINE_CYCLE = "cycle"  # Reference engine: one iteration per APU cycle
+    ENGINE_EVENT = "event"  # Fast-forward engine: one iteration per event (command, phase step, end of Wait/Sync)
+    ENGINE_BLOCK = "block"  # Fast-forward engine, with the samples between two commands rendered as NumPy blocks
+    ENGINES = [ENGINE_CYCLE, ENGINE_EVENT, ENGINE_BLOCK]
+
+    # Binary snapshot (see snapshot), little endian: header, registers, mixer, then one record per channel
+    SNAPSHOT_MAGIC = b"KAPS"
+    SNAPSHOT_VERSION = 1
+    SNAPSHOT_HEADER = struct.Struct("<4sBHB")          # magic, version, sampling ratio, channels
+    SNAPSHOT_REGISTERS = struct.Struct("<qiiiiBiiii")  # cycle, aip, eip, samplingCounter, noopCounter, noopSynced, loop registers
+    SNAPSHOT_MIXER = struct.Struct("<8BBBB")           # volumes, left, right, average
+    SNAPSHOT_CHANNEL = struct.Struct("<q10i64h10i64h")  # position, registers and phase row, SAVE registers and phase row
+
+    def __init__(self, apuRatio=16, engine=ENGINE_CYCLE):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown APU engine: {engine}")
         self.SAMPLING_RATIO = apuRatio
+        self.engine = engine
         self.logger = logging.getLogger(__name__)
+        self.trace = ApuTrace()
+        self.cycle = 0                  # Number of cycles run so far
         self.aip = 0
         self.eip = 0
         self.samplingCounter = 0
@@ -19,9 +45,57 @@ class Apu:
         self.loopLength = 0             # LOOP: How many commands to loop
         self.loopCommandCountdown = 0   # LOOP: How many commands left before the loop ends
 
-        self.channels: list[ApuChannel] = [ApuChannel() for _ in range(8)]
+        self.periods = ApuPeriodCache()  # Waveform periods, shared by the channels
+        self.phases = ApuPhaseTable(8)   # Phase templates of the channels
+        self.channels: list[ApuChannel] = [ApuChannel(i, self.trace, self.periods, self.phases) for i in range(8)]
 
-        self.mixerMode = 0
+        self.mixer = ApuMixer(len(self.channels))
+        self.translator = ApuTranslator(apuRatio)
+
+    def snapshot(self) -> bytes:
+        # Full state of the APU (registers, mixer, channels and phase templates), see restore.
+        # The caches (translated blocks, waveform periods) and the trace subscribers are not part of it.
+        mixer = self.mixer
+        parts = [
+            self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, self.SNAPSHOT_VERSION, self.SAMPLING_RATIO, len(self.channels)),
+            self.SNAPSHOT_REGISTERS.pack(
+                self.cycle, self.aip, self.eip, self.samplingCounter, self.noopCounter, self.noopSynced,
+                self.loopAddress, self.loopCountdown, self.loopLength, self.loopCommandCountdown,
+            ),
+            self.SNAPSHOT_MIXER.pack(*mixer.volumes, mixer.left, mixer.right, mixer.average),
+        ]
+        for channel in self.channels:
+            (registers, row), (savedRegisters, savedRow) = channel.snapshot(), channel.saved
+            parts.append(self.SNAPSHOT_CHANNEL.pack(channel.position, *registers, *row, *savedRegisters, *savedRow))
+        return b"".join(parts)
+
+    def restore(self, snapshot: bytes):
+        # Back to the state of a snapshot: the next run continues exactly as the snapshotted APU would have
+        magic, version, ratio, channels = self.SNAPSHOT_HEADER.unpack_from(snapshot, 0)
+        if magic != self.SNAPSHOT_MAGIC or version != self.SNAPSHOT_VERSION:
+            raise ValueError("Not an APU snapshot, or unsupported version")
+        if ratio != self.SAMPLING_RATIO or channels != len(self.channels):
+            raise ValueError(f"APU snapshot of another configuration (ratio {ratio}, {channels} channels)")
+        if len(snapshot) != self.SNAPSHOT_HEADER.size + self.SNAPSHOT_REGISTERS.size + self.SNAPSHOT_MIXER.size + channels * self.SNAPSHOT_CHANNEL.size:
+            raise ValueError("Truncated APU snapshot")
+        offset = self.SNAPSHOT_HEADER.size
+        (
+            self.cycle, self.aip, self.eip, self.samplingCounter, self.noopCounter, noopSynced,
+            self.loopAddress, self.loopCountdown, self.loopLength, self.loopCommandCountdown,
+        ) = self.SNAPSHOT_REGISTERS.unpack_from(snapshot, offset)
+        self.noopSynced = bool(noopSynced)
+        offset += self.SNAPSHOT_REGISTERS.size
+        mixer = self.mixer
+        values = self.SNAPSHOT_MIXER.unpack_from(snapshot, offset)
+        mixer.volumes = list(values[:8])
+        mixer.left, mixer.right, mixer.average = values[8:]
+        offset += self.SNAPSHOT_MIXER.size
+        for channel in self.channels:
+            values = self.SNAPSHOT_CHANNEL.unpack_from(snapshot, offset)
+            channel.position = values[0]
+            channel.restore((values[1:11], values[11:75]))
+            channel.saved = (values[75:85], values[85:149])
+            offset += self.SNAPSHOT_CHANNEL.size
 
     def executeCommand(self, data: bytes):
         # NOOP
@@ -35,12 +109,18 @@ class Apu:
         # Jump
         if self.loopCountdown > 0:
             if self.loopCommandCountdown == 0:
+                if self.trace.loop:
+                    for callback in self.trace.loop:
+                        callback(self.cycle, self.aip, self.loopAddress, self.loopCountdown - 1)
                 self.aip = self.loopAddress
                 self.loopCountdown -= 1
                 self.loopCommandCountdown = self.loopLength
             self.loopCommandCountdown -= 1
 
         # Execute
+        if self.trace.command:
+            for callback in self.trace.command:
+                callback(self.cycle, self.aip, data)
         match (data[self.aip] >> 4):
             case 0b0000:
                 if (data[self.aip] & 0x0F) != 0b1111:
@@ -72,14 +152,12 @@ class Apu:
 
     def exec_wait(self, data: bytes):
         waitCycles = data[self.aip] & 0x0F
-        self.logger.info(f"Wait {waitCycles} cycles")
         self.noopCounter = waitCycles
         self.noopSynced = False
         self.aip += 1
 
     def exec_sync(self, data: bytes):
         syncCycles = (data[self.aip+2]<<8) | data[self.aip+1]
-        self.logger.info(f"Sync {syncCycles} sampling cycles")
         self.noopCounter = syncCycles
         self.noopSynced = True
         self.aip += 3
@@ -87,7 +165,6 @@ class Apu:
     def exec_set(self, data: bytes):
         registerId = data[self.aip] & 0x0F
         value = data[self.aip + 1]
-        self.logger.info(f"Set register {registerId} to {value}")
         match registerId:
             case 0b0000: # REG_CHAN_ENABLED
                 self.channels[0].state.enabled = (value >> 0) & 1
@@ -99,23 +176,15 @@ class Apu:
                 self.channels[6].state.enabled = (value >> 6) & 1
                 self.channels[7].state.enabled = (value >> 7) & 1
             case 0b0001: # REG_CHAN_LEFT
-                self.channels[0].state.left = (value >> 0) & 1
-                self.channels[1].state.left = (value >> 1) & 1
-                self.channels[2].state.left = (value >> 2) & 1
-                self.channels[3].state.left = (value >> 3) & 1
-                self.channels[4].state.left = (value >> 4) & 1
-                self.channels[5].state.left = (value >> 5) & 1
-                self.channels[6].state.left = (value >> 6) & 1
-                self.channels[7].state.left = (value >> 7) & 1
+                self.mixer.left = value
             case 0b0010: # REG_CHAN_RIGHT
-                self.channels[0].state.right = (value >> 0) & 1
-                self.channels[1].state.right = (value >> 1) & 1
-                self.channels[2].state.right = (value >> 2) & 1
-                self.channels[3].state.right = (value >> 3) & 1
-                self.channels[4].state.right = (value >> 4) & 1
-                self.channels[5].state.right = (value >> 5) & 1
-                self.channels[6].state.right = (value >> 6) & 1
-                self.channels[7].state.right = (value >> 7) & 1
+                self.mixer.right = value
+            case 0b0011: # REG_MIX_VOLUME_A
+                self.mixer.setVolumes(0, value)
+            case 0b0100: # REG_MIX_VOLUME_B
+                self.mixer.setVolumes(1, value)
+            case 0b0101: # REG_MIX_FLAGS
+                self.mixer.setFlags(value)
             case _:
                 self.logger.warning("Wrong registerId, ignored")
         self.aip += 2
@@ -124,7 +193,6 @@ class Apu:
         channelId = data[self.aip] & 0x0F
         registerId = (data[self.aip + 1] >> 4) & 0x0F
         value = (data[self.aip + 1] & 0x0F) << 8 | data[self.aip + 2]
-        self.logger.info(f"SetChannel register {registerId} of Channel #{channelId} to {value}")
         match registerId:
             case 0b0000: # REG_PHASE_IDS
                 activeId = (value & 0xF00) >> 8
@@ -133,20 +201,18 @@ class Apu:
                 self.channels[channelId].state.phaseMaxId = maxId
                 self.channels[channelId].state.phaseIdShift = phaseIdShift
                 self.channels[channelId].setPhaseActiveId(activeId)
-                self.logger.info(f"SetPhaseIds of Channel #{channelId} to {activeId}, {maxId}, {phaseIdShift}")
         self.aip += 3
 
     def exec_setPhase(self, data: bytes):
         channelId = data[self.aip] & 0x0F
         phaseId = (data[self.aip + 1] >> 4) & 0x0F
-        newPhase = ApuChannelPhase(
+        self.channels[channelId].setPhase(
+            phaseId,
             ((data[self.aip + 1] & 0b111) << 8) + data[self.aip + 2],
             data[self.aip + 3],
             data[self.aip + 4],
             -1 if (data[self.aip + 1] & 0b1000) == 0 else 1,
         )
-        self.logger.info(f"SetPhase {phaseId} of Channel #{channelId} to {newPhase}")
-        self.channels[channelId].state.phases[phaseId] = newPhase
         self.aip += 5
 
     def exec_loop(self, data: bytes):
@@ -154,51 +220,181 @@ class Apu:
         self.loopCountdown = ((data[self.aip] & 0b1111) << 2) + (data[self.aip + 1] >> 6)
         self.loopLength = data[self.aip+1] & 0b111111
         self.loopCommandCountdown = self.loopLength
-        self.logger.info(f"Loop at @{self.loopAddress:03x} after {self.loopLength} commands, {self.loopCountdown} times")
         self.aip += 2
 
     def exec_jump(self, data: bytes):
         jumpAddress = ((data[self.aip] & 0b1111) << 8) + data[self.aip + 1]
-        self.logger.info(f"Jump to @{jumpAddress:03x}")
+        if self.trace.jump:
+            for callback in self.trace.jump:
+                callback(self.cycle, self.aip, jumpAddress)
         self.aip = jumpAddress
 
     def exec_save(self, data: bytes):
         channelId = data[self.aip] & 0x0F
         self.channels[channelId].save_state()
-        self.logger.info(f"Save state of Channel #{channelId}")
         self.aip += 1
 
     def exec_load(self, data: bytes):
         channelId = data[self.aip] & 0x0F
         self.channels[channelId].load_state()
-        self.logger.info(f"Load state of Channel #{channelId}")
         self.aip += 1
 
-    def combine_samples(self, samples: list[int]):
-        # Mode 0 : Capped Sum
-        match self.mixerMode:
-            case 0:
-                return (
-                    min(sum(s[0] - APU_AMPLITUDE_DEF for s in samples) + APU_AMPLITUDE_DEF, APU_AMPLITUDE_MAX),
-                    min(sum(s[1] - APU_AMPLITUDE_DEF for s in samples) + APU_AMPLITUDE_DEF, APU_AMPLITUDE_MAX),
-                )
-            # Mode 1 : Average
-            case 1:
-                return (
-                    sum(s[0] for s in samples) / len(samples),
-                    sum(s[1] for s in samples) / len(samples),
-                )
-
-    def run(self, data: bytes, cycles=1):
-        samples = []
+    def run(self, data: bytes, cycles=1, samples: ApuSampleBuffer = None) -> ApuSampleBuffer:
+        # The samples are appended to the given buffer (or to a new one)
+        if samples is None:
+            samples = ApuSampleBuffer()
+        match self.engine:
+            case self.ENGINE_EVENT | self.ENGINE_BLOCK:
+                self.run_events(data, cycles, samples)
+            case _:
+                self.run_cycles(data, cycles, samples)
+        return samples
+
+    def stream(self, data: bytes, cycles: int = None, chunkSize: int = APU_STREAM_CHUNK_SIZE):
+        # Generator of chunks of chunkSize frames (the last one can be shorter), endless when cycles is None.
+        # The APU state is kept between chunks: the concatenated chunks are the same as a single run.
+        if chunkSize < 1:
+            raise ValueError(f"Invalid chunk size: {chunkSize}")
+        while cycles is None or cycles > 0:
+            # Stop right after the sampling cycle of the last frame of the chunk
+            chunkCycles = self.samplingCounter + (chunkSize - 1) * self.SAMPLING_RATIO + 1
+            if cycles is not None:
+                chunkCycles = min(chunkCycles, cycles)
+                cycles -= chunkCycles
+            chunk = self.run(data, chunkCycles)
+            if chunk:
+                yield chunk
+
+    def advance(self, data: bytes, cycles: int):
+        # Same state as after run(data, cycles), without producing the samples between the commands (see ApuChannel.advance)
+        self.run_events(data, cycles, ApuSampleBuffer(), stateOnly=True)
+
+    def run_cycles(self, data: bytes, cycles: int, samples: ApuSampleBuffer):
         while cycles > 0:
             self.executeCommand(data)
             # One sample every SAMPLING_RATIO Cycle
             if self.samplingCounter == 0:
-                newSample = self.combine_samples([c.sample() for c in self.channels])
-                samples.append(newSample)
+                frame = self.mixer.mix([c.sample() for c in self.channels])
+                samples.extend(frame)
+                if self.trace.sample:
+                    self.emitSamples(self.sampleIndex(), bytes(frame))
                 self.samplingCounter = self.SAMPLING_RATIO
             self.samplingCounter -= 1
             # Next cycle
+            self.cycle += 1
             cycles -= 1
-        return samples
\ No newline at end of file
+
+    def run_events(self, data: bytes, cycles: int, samples: ApuSampleBuffer, stateOnly: bool = False):
+        # Same output as run_cycles, but the cycles spent in a Wait/Sync are skipped in one go.
+        # stateOnly: the samples of the Wait/Sync cycles are not produced, the channels only advance.
+        self.translator.load(data)
+        while cycles > 0:
+            span = min(self.noopSpan(), cycles)
+            if span == 0:
+                # Command cycles: run the translated block at AIP when possible
+                executed = self.executeBlock(cycles, samples)
+                if executed > 0:
+                    cycles -= executed
+                    continue
+                # Same as run_cycles
+                self.executeCommand(data)
+                if self.samplingCounter == 0:
+                    frame = self.mixer.mix([c.sample() for c in self.channels])
+                    samples.extend(frame)
+                    if self.trace.sample:
+                        self.emitSamples(self.sampleIndex(), bytes(frame))
+                    self.samplingCounter = self.SAMPLING_RATIO
+                self.samplingCounter -= 1
+                self.cycle += 1
+                cycles -= 1
+                continue
+
+            # NOOP cycles: only the sampling ticks matter
+            ticks = self.samplingTicks(span)
+            if self.noopCounter > 0:
+                self.noopCounter -= ticks if self.noopSynced else span
+            self.samplingCounter = (self.samplingCounter - span) % self.SAMPLING_RATIO
+            if stateOnly:
+                for c in self.channels:
+                    c.advance(ticks)
+            elif self.engine == self.ENGINE_BLOCK:
+                self.renderBlock(ticks, samples)
+            else:
+                self.fastForward(ticks, samples)
+            self.cycle += span
+            cycles -= span
+
+    def executeBlock(self, cycles: int, samples: ApuSampleBuffer) -> int:
+        # Execute the commands of the translated block at AIP, return the number of executed commands (0 if left to executeCommand)
+        if self.trace.command or self.trace.sample or self.trace.jump:
+            return 0  # The translated blocks do not emit events
+        limit = cycles
+        if self.loopCountdown > 0:
+            if self.loopCommandCountdown == 0:
+                return 0  # Loop back: done by executeCommand
+            if self.loopCommandCountdown > 0:  # Negative after an empty loop: never loops back again
+                limit = min(limit, self.loopCommandCountdown)
+        block, count = self.translator.block(self.aip)
+        if block is None:
+            return 0
+        if self.loopCountdown > 0:
+            # Loop check of the executed commands (done before a LOOP command of the block resets the counters)
+            self.loopCommandCountdown -= min(limit, count)
+        return block(self, samples, limit)
+
+    def noopSpan(self) -> int:
+        # Number of upcoming cycles during which no command is executed
+        if self.noopCounter < 0:
+            return APU_IDLE_FOREVER
+        if self.noopCounter == 0:
+            return 0
+        if not self.noopSynced:
+            return self.noopCounter
+        # The counter is decremented on sampling cycles only: stop right after the last one
+        return self.samplingCounter + (self.noopCounter - 1) * self.SAMPLING_RATIO + 1
+
+    def sampleIndex(self) -> int:
+        # Index of the first sample produced from the current cycle (one sample every SAMPLING_RATIO cycles since cycle 0)
+        return (self.cycle + self.SAMPLING_RATIO - 1) // self.SAMPLING_RATIO
+
+    def emitSamples(self, index: int, frames: bytes):
+        for callback in self.trace.sample:
+            callback(index, frames)
+
+    def samplingTicks(self, cycles: int) -> int:
+        # Number of sampling cycles within the next cycles
+        if self.samplingCounter >= cycles:
+            return 0
+        return (cycles - 1 - self.samplingCounter) // self.SAMPLING_RATIO + 1
+
+    def fastForward(self, count: int, samples: ApuSampleBuffer):
+        # Produce count samples, skipping the spans where no channel changes
+        index = self.sampleIndex()
+        while count > 0:
+            idle = min(min(c.idleSamples() for c in self.channels), count)
+            if idle > 0:
+                frame = self.mixer.mix([c.output() for c in self.channels])
+                samples.append_frames(frame, idle)
+                if self.trace.sample:
+                    self.emitSamples(index, bytes(frame) * idle)
+                for c in self.channels:
+                    c.skipSamples(idle)
+                index += idle
+                count -= idle
+            if count > 0:
+                frame = self.mixer.mix([c.sample() for c in self.channels])
+                samples.extend(frame)
+                if self.trace.sample:
+                    self.emitSamples(index, bytes(frame))
+                index += 1
+                count -= 1
+
+    def renderBlock(self, count: int, samples: ApuSampleBuffer):
+        # Produce count samples, each channel rendering its whole block at once
+        if count == 0:
+            return
+        amplitudes = np.stack([c.render(count) for c in self.channels])
+        frames = self.mixer.mixBlock(amplitudes)
+        samples += frames
+        if self.trace.sample:
+            self.emitSamples(self.sampleIndex(), frames.tobytes())
@@ -1,50 +1,234 @@
-import copy
+import numpy as np
 
 from .apu_channel_state import ApuChannelState
 from .apu_constants import *
+from .apu_period_cache import ApuPeriodCache
+from .apu_phase_table import ApuPhaseTable
+from .apu_trace import ApuTrace
 
 
 class ApuChannel:
-    def __init__(self):
+    def __init__(self, id: int = 0, trace: ApuTrace = None, periods: ApuPeriodCache = None, phases: ApuPhaseTable = None):
+        self.id = id
+        self.trace = trace or ApuTrace()
+        self.periods = periods if periods is not None else ApuPeriodCache()
+        self.phases = phases if phases is not None else ApuPhaseTable(id + 1)
+        self.phaseOffset = self.phases.offset(id)  # Row of the channel in the phase table
+        self.position = 0     # Index of the next sample
+        self.activations = 0  # Number of phase activations (setPhaseActiveId calls)
         self.state = ApuChannelState()
-        self.saved = self.state
+        self.saved = self.snapshot()
 
     def __str__(self):
         return f"Channel#{id(self)}(state={self.state})"
 
-    def sample(self):
+    def sample(self) -> int:
         if not self.state.enabled:
-            return (APU_AMPLITUDE_DEF, APU_AMPLITUDE_DEF)
+            self.position += 1
+            return APU_AMPLITUDE_DEF
 
+        self.step()
+        self.position += 1
+
+        # Sampling (the stereo routing is done by the mixer)
+        return self.state.amplitude
+
+    def step(self):
         # End of the current step: Start the next
-        self.state.phaseCountdown -= 1
-        if self.state.phaseCountdown <= 0:
-            self.state.amplitude += self.state.phaseActive.stepHeight * self.state.phaseActive.stepWay
-            self.state.amplitude = min(max(self.state.amplitude, APU_AMPLITUDE_MIN), APU_AMPLITUDE_MAX)
-            self.state.phaseActive.stepCount -= 1
-            self.state.phaseCountdown = self.state.phaseActive.stepLength
+        state = self.state
+        state.phaseCountdown -= 1
+        if state.phaseCountdown <= 0:
+            state.amplitude = min(max(state.amplitude + state.stepHeight * state.stepWay, APU_AMPLITUDE_MIN), APU_AMPLITUDE_MAX)
+            state.stepCount -= 1
+            state.phaseCountdown = state.stepLength
 
         # No more steps, load next phase
-        if self.state.phaseActive.stepCount == 0:
-            if self.state.phaseActiveId == 0:  # The current phase was the last one
-                self.setPhaseActiveId(self.state.phaseMaxId)  # Loop back to first phase
-            else:  # The current phase is not the last one:
-                self.setPhaseActiveId(self.state.phaseActiveId - 1)  # Go to next phase
-
-        # Sampling
-        return (
-            self.state.amplitude * self.state.left,
-            self.state.amplitude * self.state.right,
-        )
+        if state.stepCount == 0:
+            self.nextPhase()
+
+    def nextPhase(self):
+        if self.state.phaseActiveId == 0:  # The current phase was the last one
+            self.setPhaseActiveId(self.state.phaseMaxId)  # Loop back to first phase
+        else:  # The current phase is not the last one:
+            self.setPhaseActiveId(self.state.phaseActiveId - 1)  # Go to next phase
+
+    def render(self, count: int) -> np.ndarray:
+        # Amplitude of the next count samples (same as count sample() calls)
+        samples = np.empty(count, dtype=np.uint8)
+        start = self.position
+        self.position += count
+        state = self.state
+        if not state.enabled:
+            samples.fill(APU_AMPLITUDE_DEF)
+            return samples
+
+        # Periodic waveform: from a phase switch, the output only depends on the configuration and the amplitude.
+        # Once the same switch happens twice (or is in the cache), the rest is a repetition of the samples in between.
+        # Not done when the phase switches are traced, the tiled periods do not call setPhaseActiveId.
+        tiling = not self.trace.phase
+        config = None
+        switches = {}  # Switch key -> position
+        switched = False
+        position = 0
+        while position < count:
+            if switched and tiling:
+                if config is None:
+                    config = self.periodConfig()
+                key = (config, state.phaseActiveId, state.amplitude)
+                waveform = self.periods.get(key)
+                if waveform is None and key in switches:
+                    waveform = samples[switches[key]:position].copy()
+                    self.periods.put(key, waveform)
+                if waveform is not None:
+                    # Whole periods tiled, the remaining samples (less than a period) are rendered from the same state
+                    repeats = (count - position) // len(waveform)
+                    samples[position:position + repeats * len(waveform)] = np.tile(waveform, repeats)
+                    position += repeats * len(waveform)
+                    tiling = False
+                    continue
+                switches[key] = position
+            switched = False
+
+            # Staircase of the active phase: the first step ends its countdown, then one step every stepLength samples
+            stepCount = state.stepCount
+            first = max(state.phaseCountdown - 1, 0)
+            period = max(state.stepLength, 1)
+            length = count - position
+            if stepCount > 0:  # Negative counts never reach 0: the phase steps forever
+                length = min(length, first + (stepCount - 1) * period + 1)
+            if stepCount == 0 or length < APU_RENDER_MIN_BLOCK:
+                # Phase switching without step, or too few samples for a block: one sample at a time
+                activations = self.activations
+                self.position = start + position  # Position of the phase events
+                self.step()
+                samples[position] = state.amplitude
+                position += 1
+                switched = self.activations != activations
+                continue
+            steps = 0 if length <= first else (length - 1 - first) // period + 1
+
+            # Step heights share the same sign within a phase, so clamping the cumulated sum is the same as clamping each step
+            height = state.stepHeight * state.stepWay
+            stepIds = np.arange(length, dtype=np.int64) - first
+            np.floor_divide(stepIds, period, out=stepIds, where=stepIds >= 0)
+            stepIds += 1
+            np.maximum(stepIds, 0, out=stepIds)
+            samples[position:position + length] = np.clip(state.amplitude + height * stepIds, APU_AMPLITUDE_MIN, APU_AMPLITUDE_MAX)
+            position += length
+
+            # Resulting state, as if stepped one sample at a time
+            if steps == 0:
+                state.phaseCountdown -= length
+                continue
+            state.amplitude = min(max(state.amplitude + height * steps, APU_AMPLITUDE_MIN), APU_AMPLITUDE_MAX)
+            state.stepCount -= steps
+            state.phaseCountdown = state.stepLength - (length - 1 - first - (steps - 1) * period)
+            if state.stepCount == 0:
+                self.position = start + position - 1
+                self.nextPhase()
+                switched = True
+        self.position = start + count
+        return samples
+
+    def advance(self, count: int):
+        # State after the next count samples, as render(count) but without the samples: each staircase is
+        # skipped in one go and, once the same phase switch happens twice, the whole periods in between too.
+        state = self.state
+        if not state.enabled or self.trace.phase:
+            self.render(count)  # Nothing to skip, or phase events to emit
+            return
+        switches = {}  # Switch key -> position
+        config = None
+        position = 0
+        while position < count:
+            activations = self.activations
+            stepCount = state.stepCount
+            if stepCount == 0:
+                self.step()
+                position += 1
+            else:
+                # Same staircase arithmetic as render
+                first = max(state.phaseCountdown - 1, 0)
+                period = max(state.stepLength, 1)
+                length = count - position
+                if stepCount > 0:
+                    length = min(length, first + (stepCount - 1) * period + 1)
+                position += length
+                if length <= first:
+                    state.phaseCountdown -= length
+                    continue
+                steps = (length - 1 - first) // period + 1
+                state.amplitude = min(max(state.amplitude + state.stepHeight * state.stepWay * steps, APU_AMPLITUDE_MIN), APU_AMPLITUDE_MAX)
+                state.stepCount -= steps
+                state.phaseCountdown = state.stepLength - (length - 1 - first - (steps - 1) * period)
+                if state.stepCount == 0:
+                    self.nextPhase()
+            if switches is None or self.activations == activations:
+                continue
+
+            # Phase switch: the state only depends on the key, the same key means a period of the waveform
+            if config is None:
+                config = self.periodConfig()
+            key = (config, state.phaseActiveId, state.amplitude)
+            if key in switches:
+                length = position - switches[key]
+                position += (count - position) // length * length
+                switches = None  # Only the whole periods are skipped
+            else:
+                switches[key] = position
+        self.position += count
+
+    def periodConfig(self) -> tuple:
+        # Everything a phase switch depends on, but the entered phase and the amplitude
+        return (self.state.phaseMaxId, self.state.phaseIdShift, self.phases.row(self.id))
+
+    def output(self) -> int:
+        # Current output, as returned by sample() when the state does not change
+        if not self.state.enabled:
+            return APU_AMPLITUDE_DEF
+        return self.state.amplitude
+
+    def idleSamples(self) -> int:
+        # Number of upcoming samples that only decrement the phase countdown (no step, no phase change)
+        if not self.state.enabled:
+            return APU_IDLE_FOREVER
+        if self.state.stepCount == 0:
+            return 0
+        return max(self.state.phaseCountdown - 1, 0)
+
+    def skipSamples(self, count: int):
+        # Fast-forward over idle samples (see idleSamples)
+        self.position += count
+        if self.state.enabled:
+            self.state.phaseCountdown -= count
+
+    def setPhase(self, phaseId: int, stepLength: int, stepHeight: int, stepCount: int, stepWay: int):
+        # Phase template, used by the next activations of the phase
+        offset = self.phaseOffset + (phaseId % ApuPhaseTable.PHASES) * ApuPhaseTable.FIELDS
+        self.phases.table[offset:offset + ApuPhaseTable.FIELDS] = (stepLength, stepHeight, stepCount, stepWay)
 
     def setPhaseActiveId(self, id: int):
-        self.state.phaseActiveId = id
-        actualId = (self.state.phaseActiveId + self.state.phaseIdShift) % 16
-        self.state.phaseActive = copy.deepcopy(self.state.phases[actualId])
-        self.state.phaseCountdown = self.state.phaseActive.stepLength
+        state = self.state
+        state.phaseActiveId = id
+        actualId = (id + state.phaseIdShift) % 16
+        offset = self.phaseOffset + actualId * ApuPhaseTable.FIELDS
+        state.stepLength, state.stepHeight, state.stepCount, state.stepWay = self.phases.table[offset:offset + ApuPhaseTable.FIELDS]
+        state.phaseCountdown = state.stepLength
+        self.activations += 1
+        if self.trace.phase:
+            for callback in self.trace.phase:
+                callback(self.position, self.id, id, actualId)
+
+    def snapshot(self) -> tuple:
+        # Registers and phase templates of the channel
+        return (self.state.snapshot(), self.phases.row(self.id))
+
+    def restore(self, snapshot: tuple):
+        self.state.restore(snapshot[0])
+        self.phases.setRow(self.id, snapshot[1])
 
     def save_state(self):
-        self.saved = self.state
+        self.saved = self.snapshot()
 
     def load_state(self):
-        self.state = self.saved
+        self.restore(self.saved)
@@ -1,4 +1,6 @@
 class ApuChannelPhase:
+    __slots__ = ("stepLength", "stepHeight", "stepCount", "stepWay")
+
     def __init__(self, stepLength=0, stepHeight=0, stepCount=1, stepWay=1):
         self.stepLength = stepLength
         self.stepHeight = stepHeight
@@ -7,3 +9,6 @@ class ApuChannelPhase:
 
     def __str__(self):
         return f"ChannelPhase#{id(self)}(stepLength={self.stepLength}, stepHeight={self.stepHeight}, stepCount={self.stepCount}, stepWay={self.stepWay})"
+
+    def copy(self) -> 'ApuChannelPhase':
+        return ApuChannelPhase(self.stepLength, self.stepHeight, self.stepCount, self.stepWay)
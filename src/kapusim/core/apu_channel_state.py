@@ -1,19 +1,29 @@
-from .apu_channel_phase import ApuChannelPhase
+from .apu_constants import *
 
 
 class ApuChannelState:
+    """Registers of a channel, the active phase being held in stepLength, stepHeight, stepCount and stepWay.
+
+    The phase templates are in the APU phase table (see ApuPhaseTable), so that a snapshot of the
+    registers is a small tuple.
+    """
+
+    __slots__ = ("enabled", "phaseMaxId", "phaseIdShift", "phaseActiveId", "phaseCountdown", "amplitude", "stepLength", "stepHeight", "stepCount", "stepWay")
+
     def __init__(self):
         self.enabled = 0
-        self.left = 1
-        self.right = 1
-        self.phases = [ApuChannelPhase(255, 0, 255, 0)] * 16
         self.phaseMaxId = 0
         self.phaseIdShift = 0
         self.phaseActiveId = 0
-        self.phaseActive: ApuChannelPhase = self.phases[0]
         self.phaseCountdown = 0
         self.amplitude = 0
+        self.stepLength, self.stepHeight, self.stepCount, self.stepWay = APU_PHASE_DEFAULT  # Active phase
 
     def __str__(self):
-        phasesStr = ", ".join(p.__str__() for p in self.phases if p != None)
-        return f"ChannelState#{id(self)}(enabled={self.enabled}, stereo={self.left}{self.right}, phases=#{id(self.phases)}[{phasesStr}])"
+        return f"ChannelState#{id(self)}(enabled={self.enabled}, phase={self.phaseActiveId}/{self.phaseMaxId}+{self.phaseIdShift}, active=({self.stepLength}, {self.stepHeight}, {self.stepCount}, {self.stepWay}), countdown={self.phaseCountdown}, amplitude={self.amplitude})"
+
+    def snapshot(self) -> tuple:
+        return (self.enabled, self.phaseMaxId, self.phaseIdShift, self.phaseActiveId, self.phaseCountdown, self.amplitude, self.stepLength, self.stepHeight, self.stepCount, self.stepWay)
+
+    def restore(self, snapshot: tuple):
+        (self.enabled, self.phaseMaxId, self.phaseIdShift, self.phaseActiveId, self.phaseCountdown, self.amplitude, self.stepLength, self.stepHeight, self.stepCount, self.stepWay) = snapshot
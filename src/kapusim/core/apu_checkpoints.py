@@ -0,0 +1,136 @@
+import hashlib
+import struct
+
+from .apu_constants import *
+from .apu_sample_buffer import ApuSampleBuffer
+
+
+class ApuCheckpoints:
+    """Index of APU snapshots taken every `interval` samples of a render, to seek without rendering from the start.
+
+    The checkpoint of sample k is the snapshot of the APU at cycle k x ratio, right before the
+    sampling cycle of sample k: restoring it and running the APU outputs the samples from k on.
+    Once attached, the runs of the APU (Apu.run, and the state-only Apu.advance of the parallel
+    and pipeline renders) are split at the checkpoint cycles and the missing checkpoints are taken
+    on the way. Seeking restores the nearest checkpoint at or before the
+    target, then renders (and drops) less than `interval` samples: the seek time no longer depends
+    on the position in the song.
+
+    The index belongs to one program and one sampling ratio (see Apu.snapshot): using it with
+    another program raises a ValueError. It can be saved and loaded, to seek right away in a later run.
+    """
+
+    MAGIC = b"KAPC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sBHQ20sI")  # magic, version, sampling ratio, interval, program digest (SHA-1), checkpoints
+    ENTRY = struct.Struct("<QI")          # sample index, snapshot size (followed by the snapshot)
+
+    def __init__(self, interval: int = APU_CHECKPOINT_INTERVAL, ratio: int = APU_CLOCK_RATIO):
+        if interval < 1:
+            raise ValueError(f"Invalid checkpoint interval: {interval}")
+        self.interval = interval
+        self.ratio = ratio
+        self.program = None  # Digest of the program the checkpoints were taken from
+        self.snapshots: dict[int, bytes] = {}  # Sample index -> Apu.snapshot()
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def check(self, apu, data: bytes):
+        # The checkpoints are only valid for one program and one sampling ratio
+        if apu.SAMPLING_RATIO != self.ratio:
+            raise ValueError(f"Checkpoints taken with a sampling ratio of {self.ratio}, not {apu.SAMPLING_RATIO}")
+        digest = hashlib.sha1(data).digest()
+        if self.program is None:
+            self.program = digest
+        elif self.program != digest:
+            raise ValueError("Checkpoints taken from another program")
+
+    def attach(self, apu):
+        apu.run = self.checkpointRun(apu, apu.run)
+        apu.advance = self.checkpointAdvance(apu, apu.advance)
+
+    def checkpointRun(self, apu, run):
+        def checkpointed(data, cycles=1, samples=None):
+            if samples is None:
+                samples = ApuSampleBuffer()
+            self.check(apu, data)
+            # Run up to each checkpoint cycle, then take the checkpoint
+            while cycles > 0:
+                self.take(apu)
+                span = min(cycles, self.nextCycle(apu.cycle) - apu.cycle)
+                run(data, span, samples)
+                cycles -= span
+            self.take(apu)
+            return samples
+        return checkpointed
+
+    def checkpointAdvance(self, apu, advance):
+        def checkpointed(data, cycles):
+            self.check(apu, data)
+            while cycles > 0:
+                self.take(apu)
+                span = min(cycles, self.nextCycle(apu.cycle) - apu.cycle)
+                advance(data, span)
+                cycles -= span
+            self.take(apu)
+        return checkpointed
+
+    def nextCycle(self, cycle: int) -> int:
+        # First checkpoint cycle after the given one
+        period = self.interval * self.ratio
+        return (cycle // period + 1) * period
+
+    def take(self, apu):
+        # Snapshot of the APU when on a checkpoint cycle, unless already taken
+        period = self.interval * self.ratio
+        if apu.cycle % period == 0:
+            sample = apu.cycle // self.ratio
+            if sample not in self.snapshots:
+                self.snapshots[sample] = apu.snapshot()
+
+    def nearest(self, sample: int) -> int:
+        # Sample index of the last checkpoint at or before the given sample, None if there is none
+        sample = min(sample // self.interval * self.interval, max(self.snapshots, default=0))
+        while sample >= 0 and sample not in self.snapshots:
+            sample -= self.interval
+        return sample if sample >= 0 else None
+
+    def seek(self, apu, data: bytes, sample: int):
+        # Bring the APU right before the sampling cycle of the given sample, from the nearest checkpoint.
+        # Without checkpoint before the target, the APU must be a new one (rendered from cycle 0).
+        self.check(apu, data)
+        nearest = self.nearest(sample)
+        ahead = apu.cycle > sample * self.ratio  # The APU cannot run backwards
+        if nearest is not None and (ahead or nearest * self.ratio >= apu.cycle):
+            apu.restore(self.snapshots[nearest])
+        elif ahead:
+            raise ValueError(f"Cannot seek back to sample {sample}: no checkpoint before it")
+        cycles = sample * self.ratio - apu.cycle
+        if cycles > 0:
+            apu.run(data, cycles)  # Samples dropped
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.ratio, self.interval, self.program or bytes(20), len(self.snapshots)))
+            for sample in sorted(self.snapshots):
+                snapshot = self.snapshots[sample]
+                f.write(self.ENTRY.pack(sample, len(snapshot)))
+                f.write(snapshot)
+
+    @classmethod
+    def load(cls, path: str) -> "ApuCheckpoints":
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, ratio, interval, program, count = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"'{path}' is not an APU checkpoint file, or of an unsupported version")
+        checkpoints = cls(interval, ratio)
+        checkpoints.program = program if count > 0 else None
+        offset = cls.HEADER.size
+        for _ in range(count):
+            sample, size = cls.ENTRY.unpack_from(data, offset)
+            offset += cls.ENTRY.size
+            checkpoints.snapshots[sample] = data[offset:offset + size]
+            offset += size
+        return checkpoints
@@ -1,6 +1,34 @@
 APU_AMPLITUDE_MAX = 255  # 8-bit amplitude range
 APU_AMPLITUDE_MIN = 0    # 8-bit amplitude range
 APU_AMPLITUDE_DEF = 0    # Default amplitude
+APU_AMPLITUDE_SILENCE = 128  # Silence of the unsigned 8-bit output samples (midpoint of the range)
+APU_PHASE_DEFAULT = (255, 0, 255, 0)  # Phase at power-up: stepLength, stepHeight, stepCount, stepWay
+
+APU_MIXING_BUFFER_MASK = 0x7FF  # 11-bit mixing buffers
 
 APU_SAMPLE_RATE = 44100  # Hz
-APU_CLOCK_RATIO = 16     # 16 clock cycle = 1 sample
\ No newline at end of file
+APU_CLOCK_RATIO = 16     # 16 clock cycle = 1 sample
+APU_CLOCK_FREQUENCY = APU_SAMPLE_RATE * APU_CLOCK_RATIO  # Hz, the sample rate being this frequency / sampling ratio
+
+APU_IDLE_FOREVER = 1 << 62  # Span (in cycles or samples) of a state that never changes by itself
+APU_RENDER_MIN_BLOCK = 8  # Below this number of samples, rendering sample by sample is faster than NumPy
+APU_STREAM_CHUNK_SIZE = 4096  # Default number of frames per chunk when streaming
+APU_PERIOD_CACHE_SIZE = 32  # Waveform periods kept by the channels (LRU)
+APU_PERIOD_MAX_LENGTH = 1 << 16  # Longest waveform period kept, in samples
+APU_CHECKPOINT_INTERVAL = 44100  # Samples between two checkpoints of a render (see ApuCheckpoints)
+APU_PARALLEL_SLICES_PER_JOB = 4  # Slices of a parallel render per worker process, to balance the load
+APU_PARALLEL_MIN_SLICE = 44100  # Shortest slice of a parallel render, in samples
+APU_RENDER_CACHE_SIZE = 1 << 30  # Bytes kept in a render cache directory (see ApuRenderCache)
+APU_ENGINE_VERSION = 1  # Version of the rendered samples: to be increased when a change alters them (invalidates the render caches)
+
+APU_OPCODE_NAMES = {  # Mnemonic of each opcode (high nibble of the first byte), WAIT 15 being SYNC
+    0b0000: "WAIT",
+    0b0001: "SET",
+    0b0010: "SETPHASE",
+    0b0011: "SETCHANNEL",
+    0b0100: "LOOP",
+    0b0101: "JUMP",
+    0b0110: "SAVE",
+    0b0111: "LOAD",
+}
+APU_OPCODE_SIZES = {"WAIT": 1, "SYNC": 3, "SET": 2, "SETPHASE": 5, "SETCHANNEL": 3, "LOOP": 2, "JUMP": 2, "SAVE": 1, "LOAD": 1}
@@ -0,0 +1,69 @@
+import numpy as np
+
+from .apu_constants import *
+
+
+class ApuMixer:
+    """Sampling & Mixing Unit of the APU (see docs/konsolid8/APU.md).
+
+    For each channel, the sample is scaled by its volume (right shift by 0-3: 100%, 50%, 25%, 12.5%),
+    then added to the Left and/or Right mixing buffers depending on the stereo masks. The 11-bit
+    buffers are either capped at 255, or divided by 8 when the MixingAvg flag is set.
+
+    Registers (one bit or one 2-bit field per channel, channel 0 on the LSB):
+    - volumeA (8b) : Volume of channels 0-3 (4x2b)
+    - volumeB (8b) : Volume of channels 4-7 (4x2b)
+    - left (8b)    : Stereo Left enabled mask
+    - right (8b)   : Stereo Right enabled mask
+    - flags (8b)   : Global flags, bit 0 = MixingAvg
+    """
+
+    def __init__(self, channels: int = 8):
+        self.channels = channels
+        self.volumes = [0] * channels
+        self.left = 0xFF
+        self.right = 0xFF
+        self.average = 0
+
+    def __str__(self):
+        return f"Mixer#{id(self)}(volumes={self.volumes}, stereo={self.left:08b}/{self.right:08b}, average={self.average})"
+
+    def setVolumes(self, bank: int, value: int):
+        # Bank 0 is Mixing Volume A (channels 0-3), bank 1 is Mixing Volume B (channels 4-7)
+        for i in range(4):
+            self.volumes[bank * 4 + i] = (value >> (i * 2)) & 0b11
+
+    def setFlags(self, value: int):
+        self.average = value & 1
+
+    def output(self, buffer: int) -> int:
+        buffer &= APU_MIXING_BUFFER_MASK
+        if self.average:
+            return buffer >> 3
+        return min(buffer, APU_AMPLITUDE_MAX)
+
+    def mix(self, amplitudes: list[int]) -> tuple[int, int]:
+        # Mix one sample of each channel into a (left, right) sample
+        left = 0
+        right = 0
+        for i, amplitude in enumerate(amplitudes):
+            scaled = amplitude >> self.volumes[i]
+            if (self.left >> i) & 1:
+                left += scaled
+            if (self.right >> i) & 1:
+                right += scaled
+        return (self.output(left), self.output(right))
+
+    def mixBlock(self, amplitudes: np.ndarray) -> np.ndarray:
+        # Mix a channels x N matrix of amplitudes into N interleaved (left, right) uint8 samples
+        scaled = amplitudes.astype(np.uint16) >> np.array(self.volumes, dtype=np.uint16)[:, None]
+        samples = np.empty(amplitudes.shape[1] * 2, dtype=np.uint8)
+        for offset, mask in enumerate((self.left, self.right)):
+            routing = np.array([(mask >> i) & 1 for i in range(self.channels)], dtype=np.uint16)
+            buffer = (routing @ scaled) & APU_MIXING_BUFFER_MASK
+            if self.average:
+                buffer >>= 3
+            else:
+                np.minimum(buffer, APU_AMPLITUDE_MAX, out=buffer)
+            samples[offset::2] = buffer
+        return samples
@@ -0,0 +1,98 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from .apu import Apu
+from .apu_constants import *
+from .apu_sample_buffer import ApuSampleBuffer
+
+
+def renderSlice(name: str, data: bytes, ratio: int, engine: str, snapshot: bytes, start: int, cycles: int) -> int:
+    # Worker: render one slice from its snapshot, straight into the shared output buffer. Returns the frames.
+    apu = Apu(ratio, engine)
+    apu.restore(snapshot)
+    samples = apu.run(data, cycles)
+    output = shared_memory.SharedMemory(name=name)
+    try:
+        output.buf[start * ApuSampleBuffer.CHANNELS:start * ApuSampleBuffer.CHANNELS + len(samples)] = samples
+    finally:
+        output.close()
+    return samples.frame_count()
+
+
+class ApuParallelRenderer:
+    """Time-sliced rendering of a program over several processes.
+
+    A state-only pre-pass (Apu.advance, no sample produced between the commands) runs the APU
+    over the whole render, taking a snapshot at each slice boundary (a multiple of the sampling
+    ratio from the start) and leaving the APU in its final state (the checkpoints attached to
+    it, if any, being taken on the way). Each slice is then rendered by a worker process from its
+    snapshot, straight into a shared memory buffer holding the whole output. A slice starting from
+    the exact APU state, the output is bit-identical to a serial run.
+
+    A render is cut into `jobs` x APU_PARALLEL_SLICES_PER_JOB slices (to balance the load), never
+    shorter than APU_PARALLEL_MIN_SLICE samples. The pool of processes is created on the first
+    render and kept until close(), unless an executor is given (then owned by the caller).
+    """
+
+    def __init__(self, jobs: int, ratio: int = APU_CLOCK_RATIO, engine: str = Apu.ENGINE_BLOCK, executor: Executor = None):
+        if jobs < 1:
+            raise ValueError(f"Invalid number of jobs: {jobs}")
+        self.jobs = jobs
+        self.ratio = ratio
+        self.engine = engine
+        self.executor = executor
+        self.ownExecutor = executor is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.ownExecutor and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def slices(self, frames: int) -> list[int]:
+        # First sample of each slice
+        count = max(min(self.jobs * APU_PARALLEL_SLICES_PER_JOB, frames // APU_PARALLEL_MIN_SLICE), 1)
+        return [frames * i // count for i in range(count)]
+
+    def render(self, data: bytes, cycles: int, apu: Apu = None) -> ApuSampleBuffer:
+        # Same samples as apu.run(data, cycles), apu (a new one by default) being left in its final state
+        if apu is None:
+            apu = Apu(self.ratio, self.engine)
+        if apu.SAMPLING_RATIO != self.ratio:
+            raise ValueError(f"Renderer of sampling ratio {self.ratio}, not {apu.SAMPLING_RATIO}")
+        frames = apu.samplingTicks(cycles)
+        if self.jobs == 1 or frames < 2 * APU_PARALLEL_MIN_SLICE:
+            return apu.run(data, cycles)  # Not worth the processes
+
+        # Pre-pass: snapshots at the slice boundaries (one sampling cycle every ratio cycles: slice of n samples = n x ratio cycles)
+        starts = self.slices(frames)
+        origin = apu.cycle
+        snapshots = []
+        for start in starts:
+            apu.advance(data, origin + start * self.ratio - apu.cycle)
+            snapshots.append(apu.snapshot())
+        apu.advance(data, origin + cycles - apu.cycle)
+
+        # Slices rendered into the shared output buffer
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        output = shared_memory.SharedMemory(create=True, size=frames * ApuSampleBuffer.CHANNELS)
+        try:
+            ends = [start * self.ratio for start in starts[1:]] + [cycles]
+            futures = [
+                self.executor.submit(renderSlice, output.name, data, self.ratio, self.engine, snapshot, start, end - start * self.ratio)
+                for snapshot, start, end in zip(snapshots, starts, ends)
+            ]
+            for future in futures:
+                future.result()
+            with output.buf[:frames * ApuSampleBuffer.CHANNELS] as view:
+                samples = ApuSampleBuffer(view)
+        finally:
+            output.close()
+            output.unlink()
+        return samples
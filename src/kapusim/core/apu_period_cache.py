@@ -0,0 +1,41 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from .apu_constants import *
+
+
+class ApuPeriodCache:
+    """LRU cache of the waveform periods rendered by the channels.
+
+    A period is keyed on the channel configuration at a phase switch (phase templates, phaseMaxId,
+    phaseIdShift, entered phase and amplitude): from the same configuration, a channel outputs the
+    same periodic waveform. Shared by the channels of an APU, so that a note played again later in
+    the song, or on another channel, reuses its period.
+    """
+
+    def __init__(self, size: int = APU_PERIOD_CACHE_SIZE):
+        self.size = size
+        self.periods: OrderedDict[tuple, np.ndarray] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.periods)
+
+    def get(self, key: tuple) -> np.ndarray:
+        period = self.periods.get(key)
+        if period is None:
+            self.misses += 1
+            return None
+        self.periods.move_to_end(key)
+        self.hits += 1
+        return period
+
+    def put(self, key: tuple, period: np.ndarray):
+        if self.size <= 0 or len(period) > APU_PERIOD_MAX_LENGTH:
+            return
+        self.periods[key] = period
+        self.periods.move_to_end(key)
+        while len(self.periods) > self.size:
+            self.periods.popitem(last=False)
@@ -0,0 +1,44 @@
+from .apu_channel_phase import ApuChannelPhase
+from .apu_constants import *
+
+
+class ApuPhaseTable:
+    """Phase templates of all the channels: a fixed channels x 16 table.
+
+    Held in one flat list of integers, 4 per phase (stepLength, stepHeight, stepCount, stepWay), the
+    16 phases of a channel being contiguous (one row). Activating a phase copies its 4 integers into
+    the channel registers, and a channel snapshot copies its row.
+    """
+
+    PHASES = 16
+    FIELDS = 4
+    ROW = PHASES * FIELDS
+
+    def __init__(self, channels: int = 8):
+        self.channels = channels
+        self.table = list(APU_PHASE_DEFAULT) * (channels * self.PHASES)
+
+    def __str__(self):
+        return f"PhaseTable#{id(self)}(channels={self.channels})"
+
+    def offset(self, channelId: int, phaseId: int = 0) -> int:
+        if not 0 <= channelId < self.channels:
+            raise IndexError(f"Channel {channelId} out of the phase table")
+        return (channelId * self.PHASES + phaseId % self.PHASES) * self.FIELDS
+
+    def get(self, channelId: int, phaseId: int) -> ApuChannelPhase:
+        offset = self.offset(channelId, phaseId)
+        return ApuChannelPhase(*self.table[offset:offset + self.FIELDS])
+
+    def set(self, channelId: int, phaseId: int, stepLength: int, stepHeight: int, stepCount: int, stepWay: int):
+        offset = self.offset(channelId, phaseId)
+        self.table[offset:offset + self.FIELDS] = (stepLength, stepHeight, stepCount, stepWay)
+
+    def row(self, channelId: int) -> tuple:
+        # The 16 phases of a channel (immutable copy)
+        offset = self.offset(channelId)
+        return tuple(self.table[offset:offset + self.ROW])
+
+    def setRow(self, channelId: int, row: tuple):
+        offset = self.offset(channelId)
+        self.table[offset:offset + self.ROW] = row
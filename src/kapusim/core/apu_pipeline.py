@@ -0,0 +1,105 @@
+from concurrent.futures import Executor
+
+import numpy as np
+
+from .apu import Apu
+from .apu_channel import ApuChannel
+from .apu_constants import *
+from .apu_mixer import ApuMixer
+from .apu_sample_buffer import ApuSampleBuffer
+from .apu_schedule import ApuSchedule
+
+
+def renderChannel(id: int, initial: tuple, writes: list[tuple], start: int, frames: int) -> np.ndarray:
+    # Amplitudes of one channel over the run, from its state at the start and its register writes
+    position, snapshot, saved = initial
+    channel = ApuChannel(id)
+    channel.restore(snapshot)
+    channel.saved = saved
+    channel.position = position
+    amplitudes = np.empty(frames, dtype=np.uint8)
+    rendered = 0
+    for sample, register, *values in writes:
+        if sample - start > rendered:
+            amplitudes[rendered:sample - start] = channel.render(sample - start - rendered)
+            rendered = sample - start
+        match register:
+            case "enabled":
+                channel.state.enabled = values[0]
+            case "phase":
+                channel.setPhase(*values)
+            case "phaseIds":
+                channel.state.phaseMaxId = values[1]
+                channel.state.phaseIdShift = values[2]
+                channel.setPhaseActiveId(values[0])
+            case "save":
+                channel.save_state()
+            case "load":
+                channel.load_state()
+    amplitudes[rendered:] = channel.render(frames - rendered)
+    return amplitudes
+
+
+class ApuPipeline:
+    """Two-stage rendering: the command interpreter first, then each channel on its own.
+
+    Stage 1 runs the APU state-only (Apu.advance) with an ApuSchedule attached: the output is the
+    timestamped register writes of each channel and of the mixer (the checkpoints attached to the
+    APU, if any, are taken on the way, see ApuCheckpoints). Stage 2 renders each channel
+    from its state at the start and its writes (renderChannel), in the given executor (thread or
+    process pool) or one after the other, then mixes the channels between the mixer writes. The
+    output is the same as Apu.run, and the schedule is kept (see schedule) for debugging.
+    """
+
+    def __init__(self, ratio: int = APU_CLOCK_RATIO, executor: Executor = None):
+        self.ratio = ratio
+        self.executor = executor
+        self.schedule = None  # Schedule of the last render
+
+    def render(self, data: bytes, cycles: int, apu: Apu = None) -> ApuSampleBuffer:
+        # Same samples as apu.run(data, cycles), apu (a new one by default) being left in its final state
+        if apu is None:
+            apu = Apu(self.ratio, Apu.ENGINE_EVENT)
+        if apu.SAMPLING_RATIO != self.ratio:
+            raise ValueError(f"Pipeline of sampling ratio {self.ratio}, not {apu.SAMPLING_RATIO}")
+
+        # Stage 1: commands only
+        schedule = ApuSchedule(len(apu.channels))
+        schedule.begin(apu, cycles)
+        schedule.attach(apu)
+        try:
+            apu.advance(data, cycles)
+        finally:
+            apu.trace.unsubscribe("command", schedule.on_command)
+        self.schedule = schedule
+
+        # Stage 2: channels, then mixing
+        arguments = [(i, schedule.initialChannels[i], schedule.channels[i], schedule.start, schedule.frames) for i in range(len(apu.channels))]
+        if self.executor is not None:
+            amplitudes = list(self.executor.map(renderChannel, *zip(*arguments)))
+        else:
+            amplitudes = [renderChannel(*channelArguments) for channelArguments in arguments]
+        return self.mix(schedule, np.stack(amplitudes))
+
+    def mix(self, schedule: ApuSchedule, amplitudes: np.ndarray) -> ApuSampleBuffer:
+        # Mix the channels x frames amplitudes, the mixer registers changing as scheduled
+        mixer = ApuMixer(len(amplitudes))
+        volumes, mixer.left, mixer.right, mixer.average = schedule.initialMixer
+        mixer.volumes = list(volumes)
+        samples = ApuSampleBuffer()
+        mixed = 0
+        for sample, register, *values in schedule.mixer:
+            if sample - schedule.start > mixed:
+                samples += mixer.mixBlock(amplitudes[:, mixed:sample - schedule.start])
+                mixed = sample - schedule.start
+            match register:
+                case "left":
+                    mixer.left = values[0]
+                case "right":
+                    mixer.right = values[0]
+                case "volumes":
+                    mixer.setVolumes(*values)
+                case "flags":
+                    mixer.setFlags(values[0])
+        samples += mixer.mixBlock(amplitudes[:, mixed:])
+        return samples
@@ -0,0 +1,103 @@
+import json
+from bisect import bisect_right
+
+from .apu_trace import ApuTrace
+
+
+class ApuProfiler:
+    """Source level profiler: attributes the executed cycles and the emitted samples to the commands.
+
+    A command is charged with its own cycle and the NOOP cycles that follow it (WAIT/SYNC), and with
+    the samples emitted during these cycles. With a source map (JSON file written by the compiler,
+    see kaapiler --source_map), the commands are grouped by KAA source line.
+    """
+
+    def __init__(self, sourceMap: dict = None):
+        self.source = "program"
+        self.addresses = []     # Sorted start addresses of the mapped commands
+        self.commands = []      # (size, line, text) of the mapped commands
+        if sourceMap:
+            self.source = sourceMap.get("source") or self.source
+            for command in sorted(sourceMap["commands"], key=lambda c: c["address"]):
+                self.addresses.append(command["address"])
+                self.commands.append((command["size"], command["line"], command["text"]))
+        self.ratio = 1
+        self.apu = None
+        self.executions = {}    # Per command address
+        self.cycles = {}
+        self.samples = {}
+        self.names = {}
+        self.current = None     # Address and start cycle of the command being charged
+        self.start = 0
+
+    @classmethod
+    def load(cls, sourceMapFile: str = None) -> 'ApuProfiler':
+        if not sourceMapFile:
+            return cls()
+        with open(sourceMapFile, "rt") as f:
+            return cls(json.load(f))
+
+    def attach(self, apu):
+        self.apu = apu
+        self.ratio = apu.SAMPLING_RATIO
+        apu.trace.subscribe("command", self.on_command)
+
+    def on_command(self, cycle: int, address: int, data: bytes):
+        self.charge(cycle)
+        if address not in self.executions:
+            self.executions[address] = 0
+            self.cycles[address] = 0
+            self.samples[address] = 0
+            self.names[address] = ApuTrace.commandName(data, address)
+        self.executions[address] += 1
+        self.current = address
+
+    def charge(self, cycle: int):
+        # Charge the cycles since the start of the current command (and the samples emitted on the sampling cycles, multiples of the ratio)
+        if self.current is not None:
+            self.cycles[self.current] += cycle - self.start
+            self.samples[self.current] += -(-cycle // self.ratio) - -(-self.start // self.ratio)
+        self.start = cycle
+
+    def lineOf(self, address: int) -> tuple[int, str, int]:
+        # (line, text, size) of the command at the address, (None, name, 0) when not in the source map
+        index = bisect_right(self.addresses, address) - 1
+        if index >= 0 and address < self.addresses[index] + self.commands[index][0]:
+            size, line, text = self.commands[index]
+            return (line, text, size)
+        return (None, f"@{address:03x} {self.names[address]}", 0)
+
+    def hotSpots(self) -> list[dict]:
+        # Profile per source line (per address when not mapped), the most expensive first
+        if self.apu is not None:
+            self.charge(self.apu.cycle)
+        rows = {}
+        for address in self.executions:
+            line, text, size = self.lineOf(address)
+            key = line if line is not None else text
+            row = rows.setdefault(key, {"line": line, "text": text, "addresses": [], "bytes": 0, "executions": 0, "cycles": 0, "samples": 0})
+            row["addresses"].append(address)
+            row["bytes"] += size
+            row["executions"] += self.executions[address]
+            row["cycles"] += self.cycles[address]
+            row["samples"] += self.samples[address]
+        return sorted(rows.values(), key=lambda row: (-row["cycles"], -row["executions"], row["addresses"][0]))
+
+    def format(self, rows: list[dict], limit: int = 20) -> str:
+        # Hot-spot table
+        totalCycles = sum(row["cycles"] for row in rows) or 1
+        lines = [f"{'Line':>6} {'Bytes':>5} {'Executions':>10} {'Cycles':>12} {'%':>6} {'Samples':>10}  Source"]
+        for row in rows[:limit]:
+            line = row["line"] if row["line"] is not None else "-"
+            lines.append(f"{line:>6} {row['bytes']:>5} {row['executions']:>10} {row['cycles']:>12} {100 * row['cycles'] / totalCycles:>6.2f} {row['samples']:>10}  {row['text']}")
+        if len(rows) > limit:
+            lines.append(f"... {len(rows) - limit} more lines")
+        return "\n".join(lines)
+
+    def folded(self, rows: list[dict]) -> str:
+        # Flamegraph folded stacks ("frame;frame count" per line), weighted by cycles
+        lines = []
+        for row in rows:
+            frame = f"{row['line']}: {row['text']}" if row["line"] is not None else row["text"]
+            lines.append(f"{self.source};{frame.replace(';', ',')} {row['cycles']}")
+        return "\n".join(lines) + "\n"
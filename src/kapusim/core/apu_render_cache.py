@@ -0,0 +1,121 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+
+from .apu_constants import *
+from .apu_sample_buffer import ApuSampleBuffer
+
+
+class ApuRenderCache:
+    """Content-addressed on-disk cache of rendered samples.
+
+    An entry is the raw interleaved 8-bit stereo PCM of a render, keyed by a hash of the program,
+    APU_ENGINE_VERSION and the render parameters (the engine choice is not part of it: all the
+    engines produce the same samples). A hit memory-maps the file, nothing is simulated.
+
+    The directory can be shared by several processes: an entry is written to a temporary file then
+    renamed into place (readers see a whole entry or none), and a file removed while mapped stays
+    readable by the processes mapping it. The least recently used entries (file modification time,
+    refreshed on each hit) are evicted once the directory exceeds `maxSize` bytes.
+    """
+
+    SUFFIX = ".pcm"
+
+    def __init__(self, directory: str, maxSize: int = APU_RENDER_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.hitBytes = 0  # Bytes served from the cache
+
+    def key(self, data: bytes, **parameters) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps({"version": APU_ENGINE_VERSION, **parameters}, sort_keys=True).encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / (key + self.SUFFIX)
+
+    def get(self, key: str):
+        # Samples of the entry (read-only memory map, or an empty buffer), None on a miss
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                samples = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else ApuSampleBuffer()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # Recently used
+        except OSError:
+            pass  # Evicted meanwhile, the map is still valid
+        self.hits += 1
+        self.hitBytes += size
+        return samples
+
+    def store(self, key: str, chunks: Iterable) -> Iterable:
+        # Pass the chunks through, writing them to the entry. The entry is only added once all the chunks went through.
+        path = self.path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        self.stores += 1
+        self.evict()
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        # (last use, size, path) of the entries, least recently used first
+        entries = []
+        for path in self.directory.glob("*/*" + self.SUFFIX):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # Evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        # Remove the least recently used entries until the cache fits in maxSize
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.maxSize:
+                break
+            try:
+                path.unlink()
+                self.evictions += 1
+            except FileNotFoundError:
+                pass  # Evicted by another process
+            except OSError:
+                continue  # Mapped by another process (Windows), kept for now
+            total -= size
+
+    def statistics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "hitBytes": self.hitBytes,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
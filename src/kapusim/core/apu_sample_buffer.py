@@ -0,0 +1,38 @@
+import numpy as np
+
+
+class ApuSampleBuffer(bytearray):
+    """Stereo 8-bit samples, interleaved (L0 R0 L1 R1 ...) as in an 8-bit stereo WAV file.
+
+    Being a bytearray, the buffer exposes the buffer protocol: it can be written to a file, wrapped
+    in a memoryview or viewed as a NumPy array without any copy. Note that a buffer cannot grow
+    while such a view is alive (BufferError), release the views before rendering into it again.
+    """
+
+    CHANNELS = 2
+
+    def __repr__(self):
+        return f"ApuSampleBuffer(frames={self.frame_count()})"
+
+    def frame_count(self) -> int:
+        return len(self) // self.CHANNELS
+
+    def frame(self, index: int) -> tuple[int, int]:
+        return (self[index * 2], self[index * 2 + 1])
+
+    def append_frame(self, left: int, right: int):
+        self.append(left)
+        self.append(right)
+
+    def append_frames(self, frame: tuple[int, int], count: int):
+        # Append the same (left, right) frame count times
+        self += bytes(frame) * count
+
+    def as_array(self) -> np.ndarray:
+        # (frames, 2) uint8 view on the buffer
+        return self.view(self)
+
+    @classmethod
+    def view(cls, samples) -> np.ndarray:
+        # (frames, 2) uint8 view on any buffer of interleaved samples (ApuSampleBuffer, bytes, memory map...)
+        return np.frombuffer(samples, dtype=np.uint8).reshape(-1, cls.CHANNELS)
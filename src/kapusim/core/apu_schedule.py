@@ -0,0 +1,92 @@
+import json
+
+from .apu_constants import *
+
+
+class ApuSchedule:
+    """Timestamped register writes of an APU run, per channel and for the mixer.
+
+    Once attached, the executed commands are decoded into register writes, timestamped with the
+    index of the first sample they apply to (a command executed on a sampling cycle applies to the
+    sample of that cycle). Each write is a tuple (sample, register, values...):
+    - channels[channelId] : ("enabled", value), ("phase", phaseId, stepLength, stepHeight, stepCount, stepWay),
+                            ("phaseIds", activeId, maxId, idShift), ("save",), ("load",)
+    - mixer               : ("left", mask), ("right", mask), ("volumes", bank, value), ("flags", value)
+    The channels do not influence the commands: from the state of a channel at the start of the run
+    (see begin) and its writes, the channel can be rendered on its own (see ApuPipeline).
+    """
+
+    VERSION = 1
+
+    def __init__(self, channels: int = 8):
+        self.ratio = APU_CLOCK_RATIO
+        self.start = 0   # Index of the first sample of the run
+        self.frames = 0  # Samples of the run
+        self.initialChannels = [None] * channels  # (position, snapshot, saved) of each channel at the start
+        self.initialMixer = None                  # (volumes, left, right, average) at the start
+        self.channels: list[list[tuple]] = [[] for _ in range(channels)]
+        self.mixer: list[tuple] = []
+
+    def __len__(self):
+        return sum(len(writes) for writes in self.channels) + len(self.mixer)
+
+    def begin(self, apu, cycles: int):
+        # Start of a run of the given number of cycles: state of the channels and the mixer
+        self.ratio = apu.SAMPLING_RATIO
+        self.start = apu.sampleIndex()
+        self.frames = apu.samplingTicks(cycles)
+        for i, channel in enumerate(apu.channels):
+            self.initialChannels[i] = (channel.position, channel.snapshot(), channel.saved)
+        mixer = apu.mixer
+        self.initialMixer = (list(mixer.volumes), mixer.left, mixer.right, mixer.average)
+
+    def attach(self, apu):
+        apu.trace.subscribe("command", self.on_command)
+
+    def on_command(self, cycle: int, address: int, data: bytes):
+        sample = (cycle + self.ratio - 1) // self.ratio  # First sample produced from this cycle on
+        opcode = data[address]
+        match opcode >> 4:
+            case 0b0001:
+                value = data[address + 1]
+                match opcode & 0x0F:
+                    case 0b0000:
+                        for i, writes in enumerate(self.channels):
+                            writes.append((sample, "enabled", (value >> i) & 1))
+                    case 0b0001:
+                        self.mixer.append((sample, "left", value))
+                    case 0b0010:
+                        self.mixer.append((sample, "right", value))
+                    case 0b0011:
+                        self.mixer.append((sample, "volumes", 0, value))
+                    case 0b0100:
+                        self.mixer.append((sample, "volumes", 1, value))
+                    case 0b0101:
+                        self.mixer.append((sample, "flags", value))
+            case 0b0010:
+                stepLength = ((data[address + 1] & 0b111) << 8) + data[address + 2]
+                stepWay = -1 if (data[address + 1] & 0b1000) == 0 else 1
+                phaseId = (data[address + 1] >> 4) & 0x0F
+                self.channels[opcode & 0x0F].append((sample, "phase", phaseId, stepLength, data[address + 3], data[address + 4], stepWay))
+            case 0b0011:
+                if (data[address + 1] >> 4) & 0x0F == 0b0000:  # REG_PHASE_IDS, the other registers are ignored
+                    value = (data[address + 1] & 0x0F) << 8 | data[address + 2]
+                    self.channels[opcode & 0x0F].append((sample, "phaseIds", (value & 0xF00) >> 8, (value & 0x0F0) >> 4, value & 0x00F))
+            case 0b0110:
+                self.channels[opcode & 0x0F].append((sample, "save"))
+            case 0b0111:
+                self.channels[opcode & 0x0F].append((sample, "load"))
+
+    def to_dict(self) -> dict:
+        return {
+            "version": self.VERSION,
+            "ratio": self.ratio,
+            "start": self.start,
+            "frames": self.frames,
+            "channels": [[list(write) for write in writes] for writes in self.channels],
+            "mixer": [list(write) for write in self.mixer],
+        }
+
+    def save(self, path: str):
+        with open(path, "wt") as f:
+            json.dump(self.to_dict(), f, indent=1)
@@ -0,0 +1,123 @@
+import time
+
+from .apu_trace import ApuTrace
+
+
+class ApuStats:
+    """Statistics collector of an APU run, to spot where the simulation time goes.
+
+    Once attached, it counts the executed commands per opcode, the NOOP cycles spent after each
+    WAIT/SYNC, the phase activations (one copy of the phase each) per channel, the loops and
+    jumps taken, and measures the wall time spent in Apu.run and in the mixer. The output time is
+    what is left of the total time given to report() (writing the WAV file, playing the sound...).
+    Attaching wraps the run and mixing methods of the instances: an APU without ApuStats is not slowed down.
+    """
+
+    def __init__(self):
+        self.apu = None
+        self.cycles = 0             # Cycles run while attached
+        self.frames = 0             # Frames produced while attached
+        self.commands = {}          # Executed commands per opcode name
+        self.noopCycles = {}        # NOOP cycles per opcode name (WAIT, SYNC) of the command that started them
+        self.phaseCopies = [0] * 8  # setPhaseActiveId calls (phase copies) per channel
+        self.loops = 0
+        self.jumps = 0
+        self.simulationTime = 0.0   # Wall time in Apu.run, mixing included
+        self.mixingTime = 0.0       # Wall time in the mixer
+        self.lastCommand = None     # Name and cycle of the last command, its NOOP cycles are known at the next one
+        self.lastCycle = 0
+
+    def attach(self, apu):
+        self.apu = apu
+        apu.trace.subscribe("command", self.on_command)
+        apu.trace.subscribe("phase", self.on_phase)
+        apu.trace.subscribe("loop", self.on_loop)
+        apu.trace.subscribe("jump", self.on_jump)
+        apu.run = self.timeRun(apu.run)
+        apu.mixer.mix = self.timeMixing(apu.mixer.mix)
+        apu.mixer.mixBlock = self.timeMixing(apu.mixer.mixBlock)
+
+    def timeRun(self, run):
+        def timed(data, cycles=1, samples=None):
+            startCycle = self.apu.cycle
+            startFrames = samples.frame_count() if samples is not None else 0
+            start = time.perf_counter()
+            samples = run(data, cycles, samples)
+            self.simulationTime += time.perf_counter() - start
+            self.cycles += self.apu.cycle - startCycle
+            self.frames += samples.frame_count() - startFrames
+            return samples
+        return timed
+
+    def timeMixing(self, mix):
+        def timed(amplitudes):
+            start = time.perf_counter()
+            result = mix(amplitudes)
+            self.mixingTime += time.perf_counter() - start
+            return result
+        return timed
+
+    def on_command(self, cycle: int, address: int, data: bytes):
+        self.countNoop(cycle)
+        name = ApuTrace.commandName(data, address)
+        self.commands[name] = self.commands.get(name, 0) + 1
+        self.lastCommand = name
+        self.lastCycle = cycle
+
+    def countNoop(self, cycle: int):
+        # Cycles between the last command and the given cycle
+        if self.lastCommand is not None and cycle - self.lastCycle > 1:
+            self.noopCycles[self.lastCommand] = self.noopCycles.get(self.lastCommand, 0) + cycle - self.lastCycle - 1
+            self.lastCycle = cycle - 1
+
+    def on_phase(self, sample: int, channelId: int, phaseActiveId: int, phaseId: int):
+        self.phaseCopies[channelId] += 1
+
+    def on_loop(self, cycle: int, address: int, loopAddress: int, loopCountdown: int):
+        self.loops += 1
+
+    def on_jump(self, cycle: int, address: int, jumpAddress: int):
+        self.jumps += 1
+
+    def report(self, totalTime: float = None, sampleRate: int = 44100) -> dict:
+        # Counters and timings as a JSON-friendly dict, totalTime being the wall time of the whole run (output included)
+        self.countNoop(self.apu.cycle)
+        simulationTime = self.simulationTime - self.mixingTime
+        audioTime = self.frames / sampleRate
+        report = {
+            "cycles": self.cycles,
+            "frames": self.frames,
+            "audioTime": audioTime,
+            "commandCycles": sum(self.commands.values()),
+            "noopCycles": dict(sorted(self.noopCycles.items())),
+            "commands": dict(sorted(self.commands.items())),
+            "phaseCopies": list(self.phaseCopies),
+            "loops": self.loops,
+            "jumps": self.jumps,
+            "wallTime": {
+                "simulation": simulationTime,
+                "mixing": self.mixingTime,
+            },
+            "cyclesPerSecond": self.cycles / self.simulationTime if self.simulationTime else None,
+            "realTimeFactor": audioTime / self.simulationTime if self.simulationTime else None,
+        }
+        if totalTime is not None:
+            report["wallTime"]["output"] = max(totalTime - self.simulationTime, 0.0)
+            report["wallTime"]["total"] = totalTime
+        return report
+
+    @staticmethod
+    def format(report: dict) -> str:
+        # Human readable version of a report
+        lines = [
+            f"Cycles            : {report['cycles']} (" +
+            ", ".join([f"{report['commandCycles']} commands"] + [f"{count} {name} NOOP" for name, count in report["noopCycles"].items()]) + ")",
+            f"Frames            : {report['frames']} ({report['audioTime']:.3f}s of audio)",
+            f"Commands          : " + ", ".join(f"{name}={count}" for name, count in report["commands"].items()),
+            f"Phase copies      : " + " ".join(str(count) for count in report["phaseCopies"]) + f" (total {sum(report['phaseCopies'])})",
+            f"Loops / Jumps     : {report['loops']} / {report['jumps']}",
+            f"Wall time         : " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in report["wallTime"].items()),
+        ]
+        if report["cyclesPerSecond"] is not None:
+            lines.append(f"Speed             : {report['cyclesPerSecond']:,.0f} cycles/s, {report['realTimeFactor']:.2f}x real time")
+        return "\n".join(lines)
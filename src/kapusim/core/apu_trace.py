@@ -0,0 +1,136 @@
+import logging
+import struct
+
+from .apu_constants import *
+
+
+class ApuTrace:
+    """Instrumentation surface of the APU: one list of subscribers per event.
+
+    The APU checks the list before building an event, so an event without subscriber only
+    costs a truthiness test. Subscribers are called synchronously, in the simulation thread:
+    - command(cycle, address, data) : a command is executed at data[address]
+    - phase(sample, channelId, phaseActiveId, phaseId) : a channel switched to another phase
+    - sample(sample, frames) : frames (interleaved bytes, possibly several) were emitted from the given sample index
+    - loop(cycle, address, loopAddress, loopCountdown) : a LOOP iteration jumped back to loopAddress
+    - jump(cycle, address, jumpAddress) : a JUMP was taken
+    The event times are the same for every engine, but the block engine renders one channel at a
+    time: within a block, the phase events are grouped by channel instead of being interleaved.
+    """
+
+    EVENTS = ["command", "phase", "sample", "loop", "jump"]
+
+    def __init__(self):
+        self.command = []
+        self.phase = []
+        self.sample = []
+        self.loop = []
+        self.jump = []
+
+    def subscribe(self, event: str, callback):
+        if event not in self.EVENTS:
+            raise ValueError(f"Unknown APU trace event: {event}")
+        getattr(self, event).append(callback)
+
+    def unsubscribe(self, event: str, callback):
+        getattr(self, event).remove(callback)
+
+    @staticmethod
+    def commandName(data: bytes, address: int) -> str:
+        # Name of the command at data[address] (see APU_OPCODE_NAMES), SYNC being a special WAIT
+        name = APU_OPCODE_NAMES.get(data[address] >> 4, "UNKNOWN")
+        if name == "WAIT" and (data[address] & 0x0F) == 0x0F:
+            return "SYNC"
+        return name
+
+
+class ApuTraceLogger:
+    """Subscriber logging the executed commands and the taken branches (replaces the former INFO logs)."""
+
+    def __init__(self, logger: logging.Logger = None):
+        self.logger = logger or logging.getLogger(__name__)
+
+    def attach(self, trace: ApuTrace):
+        trace.subscribe("command", self.on_command)
+        trace.subscribe("loop", self.on_loop)
+        trace.subscribe("jump", self.on_jump)
+
+    def on_command(self, cycle: int, address: int, data: bytes):
+        name = ApuTrace.commandName(data, address)
+        self.logger.info(f"[{cycle}] @{address:03x} {name} {data[address:address + APU_OPCODE_SIZES.get(name, 1)].hex()}")
+
+    def on_loop(self, cycle: int, address: int, loopAddress: int, loopCountdown: int):
+        self.logger.info(f"[{cycle}] @{address:03x} Loop back to @{loopAddress:03x}, {loopCountdown} times left")
+
+    def on_jump(self, cycle: int, address: int, jumpAddress: int):
+        self.logger.info(f"[{cycle}] @{address:03x} Jump to @{jumpAddress:03x}")
+
+
+class ApuTraceRecorder:
+    """Subscriber recording the events in a binary ring buffer, to be dumped after a run.
+
+    Each event is a fixed 16 bytes record (little endian): type (u8), channel (u8), a (u16), b (u32), time (u64).
+    - COMMAND : time = cycle, a = address, b = opcode byte
+    - PHASE   : time = sample, channel = channelId, a = phaseActiveId, b = phaseId
+    - SAMPLE  : time = sample, channel = left, a = right, b = number of frames (only the first frame is recorded)
+    - LOOP    : time = cycle, a = address, b = loopAddress | loopCountdown << 16
+    - JUMP    : time = cycle, a = address, b = jumpAddress
+    Once full, the oldest records are overwritten.
+    """
+
+    RECORD = struct.Struct("<BBHIQ")
+    COMMAND = 1
+    PHASE = 2
+    SAMPLE = 3
+    LOOP = 4
+    JUMP = 5
+    TYPES = {COMMAND: "command", PHASE: "phase", SAMPLE: "sample", LOOP: "loop", JUMP: "jump"}
+
+    def __init__(self, capacity: int = 65536, samples: bool = False):
+        self.capacity = capacity
+        self.samples = samples  # Sample events are the most frequent ones, recorded on demand only
+        self.records = bytearray(capacity * self.RECORD.size)
+        self.count = 0          # Total number of records (including the overwritten ones)
+
+    def attach(self, trace: ApuTrace):
+        trace.subscribe("command", self.on_command)
+        trace.subscribe("phase", self.on_phase)
+        trace.subscribe("loop", self.on_loop)
+        trace.subscribe("jump", self.on_jump)
+        if self.samples:
+            trace.subscribe("sample", self.on_sample)
+
+    def record(self, type: int, channel: int, a: int, b: int, time: int):
+        self.RECORD.pack_into(self.records, (self.count % self.capacity) * self.RECORD.size, type, channel, a, b, time)
+        self.count += 1
+
+    def on_command(self, cycle: int, address: int, data: bytes):
+        self.record(self.COMMAND, 0, address, data[address], cycle)
+
+    def on_phase(self, sample: int, channelId: int, phaseActiveId: int, phaseId: int):
+        self.record(self.PHASE, channelId, phaseActiveId, phaseId, sample)
+
+    def on_sample(self, sample: int, frames: bytes):
+        self.record(self.SAMPLE, frames[0], frames[1], len(frames) // 2, sample)
+
+    def on_loop(self, cycle: int, address: int, loopAddress: int, loopCountdown: int):
+        self.record(self.LOOP, 0, address, loopAddress | loopCountdown << 16, cycle)
+
+    def on_jump(self, cycle: int, address: int, jumpAddress: int):
+        self.record(self.JUMP, 0, address, jumpAddress, cycle)
+
+    def dump(self) -> bytes:
+        # Records in chronological order
+        if self.count <= self.capacity:
+            return bytes(self.records[:self.count * self.RECORD.size])
+        start = (self.count % self.capacity) * self.RECORD.size
+        return bytes(self.records[start:] + self.records[:start])
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self.dump())
+
+    @classmethod
+    def decode(cls, dump: bytes) -> list[tuple[str, int, int, int, int]]:
+        # (type, time, channel, a, b) tuples of a dump
+        return [(cls.TYPES.get(type, "unknown"), time, channel, a, b) for type, channel, a, b, time in cls.RECORD.iter_unpack(dump)]
@@ -0,0 +1,148 @@
+from .apu_constants import *
+
+
+class ApuTranslator:
+    """Translation layer of the APU interpreter: decodes a program once into basic blocks.
+
+    A block is the straight sequence of commands starting at an address, up to the first command
+    that changes the control flow (WAIT/SYNC with a count, LOOP, JUMP) or to the end of the program.
+    Each block is compiled into a Python function, with the decoded values as constants, and cached
+    by address. The function executes up to `limit` command cycles, one sample being mixed on each
+    sampling cycle as in Apu.run_events, and returns the number of executed commands.
+
+    The unknown and truncated commands are never translated: the block stops before them, and the
+    interpreter raises the same error as before. The cache belongs to one program: loading another
+    one (see load) clears it.
+    """
+
+    def __init__(self, ratio: int = APU_CLOCK_RATIO):
+        self.ratio = ratio
+        self.program = None
+        self.blocks = {}  # Address -> (function, number of commands)
+
+    def load(self, data: bytes):
+        # Blocks are only valid for the program they were translated from
+        if self.program is None or self.program != data:
+            self.program = bytes(data)
+            self.blocks = {}
+
+    def block(self, address: int) -> tuple:
+        if address not in self.blocks:
+            self.blocks[address] = self.translate(address)
+        return self.blocks[address]
+
+    def translate(self, address: int) -> tuple:
+        data = self.program
+        lines = [
+            f"def block_{address:03x}(apu, samples, limit):",
+            "    channels = apu.channels",
+            "    mixer = apu.mixer",
+            "    sc = apu.samplingCounter",
+        ]
+        count = 0
+        aip = address
+        while True:
+            statements, nextAip, last = self.decode(data, aip)
+            if statements is None:
+                # Left to the interpreter
+                lines.append(self.exit(count, aip))
+                break
+            count += 1
+            lines.append(f"    # @{aip:03x}")
+            lines += ["    " + statement for statement in statements]
+            lines += [
+                "    if sc == 0:",
+                "        samples.extend(mixer.mix([c.sample() for c in channels]))",
+                f"        sc = {self.ratio}",
+                "    sc -= 1",
+            ]
+            if nextAip >= len(data):
+                # Out of bounds: the interpreter resets the command pointer
+                lines.append(f"    apu.logger.warning('Command pointer out of bounds @{nextAip:03x}, resetting to 0')")
+                lines.append(self.exit(count, 0))
+                break
+            if last:
+                lines.append(self.exit(count, nextAip))
+                break
+            lines += [f"    if limit == {count}:", "    " + self.exit(count, nextAip)]
+            aip = nextAip
+        if count == 0:
+            return (None, 0)
+        namespace = {}
+        exec("\n".join(lines), namespace)
+        return (namespace[f"block_{address:03x}"], count)
+
+    def exit(self, count: int, aip: int) -> str:
+        # Commit the local state
+        return f"    apu.samplingCounter = sc; apu.aip = {aip}; apu.cycle += {count}; return {count}"
+
+    def decode(self, data: bytes, aip: int) -> tuple:
+        # (statements, next command address, last command of the block), no statements if not translatable
+        opcode = data[aip]
+        size = APU_OPCODE_SIZES.get(APU_OPCODE_NAMES.get(opcode >> 4), 0)
+        if opcode == 0x0F:
+            size = APU_OPCODE_SIZES["SYNC"]
+        if size == 0 or aip + size > len(data):
+            return (None, None, True)  # Left to the interpreter
+        match opcode >> 4:
+            case 0b0000:
+                if (opcode & 0x0F) != 0b1111:
+                    count, synced = opcode & 0x0F, False
+                else:
+                    count, synced = (data[aip + 2] << 8) | data[aip + 1], True
+                return ([f"apu.noopCounter = {count}", f"apu.noopSynced = {synced}"], aip + size, count > 0)
+            case 0b0001:
+                registerId = opcode & 0x0F
+                value = data[aip + 1]
+                match registerId:
+                    case 0b0000:
+                        statements = [f"channels[{i}].state.enabled = {(value >> i) & 1}" for i in range(8)]
+                    case 0b0001:
+                        statements = [f"mixer.left = {value}"]
+                    case 0b0010:
+                        statements = [f"mixer.right = {value}"]
+                    case 0b0011:
+                        statements = [f"mixer.setVolumes(0, {value})"]
+                    case 0b0100:
+                        statements = [f"mixer.setVolumes(1, {value})"]
+                    case 0b0101:
+                        statements = [f"mixer.setFlags({value})"]
+                    case _:
+                        statements = ["apu.logger.warning('Wrong registerId, ignored')"]
+                return (statements, aip + size, False)
+            case 0b0010:
+                channelId = opcode & 0x0F
+                phaseId = (data[aip + 1] >> 4) & 0x0F
+                stepLength = ((data[aip + 1] & 0b111) << 8) + data[aip + 2]
+                stepWay = -1 if (data[aip + 1] & 0b1000) == 0 else 1
+                return ([f"channels[{channelId}].setPhase({phaseId}, {stepLength}, {data[aip + 3]}, {data[aip + 4]}, {stepWay})"], aip + size, False)
+            case 0b0011:
+                channelId = opcode & 0x0F
+                registerId = (data[aip + 1] >> 4) & 0x0F
+                value = (data[aip + 1] & 0x0F) << 8 | data[aip + 2]
+                statements = []
+                if registerId == 0b0000:
+                    statements = [
+                        f"channel = channels[{channelId}]",
+                        f"channel.state.phaseMaxId = {(value & 0x0F0) >> 4}",
+                        f"channel.state.phaseIdShift = {value & 0x00F}",
+                        f"channel.setPhaseActiveId({(value & 0xF00) >> 8})",
+                    ]
+                return (statements, aip + size, False)
+            case 0b0100:
+                loopCountdown = ((opcode & 0b1111) << 2) + (data[aip + 1] >> 6)
+                loopLength = data[aip + 1] & 0b111111
+                return ([
+                    f"apu.loopAddress = {aip + size}",
+                    f"apu.loopCountdown = {loopCountdown}",
+                    f"apu.loopLength = {loopLength}",
+                    f"apu.loopCommandCountdown = {loopLength}",
+                ], aip + size, True)
+            case 0b0101:
+                jumpAddress = ((opcode & 0b1111) << 8) + data[aip + 1]
+                return ([], jumpAddress, True)
+            case 0b0110:
+                return ([f"channels[{opcode & 0x0F}].save_state()"], aip + size, False)
+            case 0b0111:
+                return ([f"channels[{opcode & 0x0F}].load_state()"], aip + size, False)
+        return (None, None, True)
@@ -0,0 +1,7 @@
+from .live_player import LivePlayer
+from .ring_buffer import SampleRingBuffer
+
+__all__ = [
+    "LivePlayer",
+    "SampleRingBuffer",
+]
@@ -0,0 +1,77 @@
+import threading
+import time
+import numpy as np
+
+from ..core.apu_sample_buffer import ApuSampleBuffer
+
+
+class CallbackStop(Exception):
+    """Raised by a stream callback to stop the stream once the current block is played."""
+
+
+class CallbackFlags:
+    def __init__(self):
+        self.output_underflow = False
+
+
+class OutputStream:
+    """Headless stand-in for sounddevice.OutputStream.
+
+    Calls the callback from its own thread like an audio device would, and keeps everything
+    that was "played" in an ApuSampleBuffer. The blocks are requested at the sample rate times
+    speed (speed=None requests them as fast as possible).
+    Use this module as LivePlayer backend to run the playback engine without audio device.
+    """
+
+    def __init__(self, samplerate: int, blocksize: int, channels: int, dtype: str, callback, finished_callback=None, latency=None, speed: float = 1.0, **kwargs):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.channels = channels
+        self.dtype = dtype
+        self.callback = callback
+        self.finished_callback = finished_callback
+        self.latency = latency
+        self.speed = speed
+        self.played = ApuSampleBuffer()
+        self.active = False
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        self.active = True
+        self.thread = threading.Thread(target=self.process, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.active = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def close(self):
+        self.stop()
+
+    def process(self):
+        outdata = np.empty((self.blocksize, self.channels), dtype=self.dtype)
+        period = self.blocksize / self.samplerate / self.speed if self.speed else 0
+        deadline = time.monotonic()
+        try:
+            while self.active:
+                try:
+                    self.callback(outdata, self.blocksize, None, CallbackFlags())
+                except CallbackStop:
+                    self.played += outdata.tobytes()
+                    break
+                self.played += outdata.tobytes()
+                if period:
+                    deadline += period
+                    time.sleep(max(deadline - time.monotonic(), 0))
+        finally:
+            self.active = False
+            if self.finished_callback:
+                self.finished_callback()
@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+
+from ..core.apu import Apu
+from ..core.apu_constants import *
+from .ring_buffer import SampleRingBuffer
+
+
+class LivePlayer:
+    """Low-latency playback of an APU program while it is rendered.
+
+    A producer thread renders the APU by chunks of blockSize frames into a lock-free ring buffer
+    holding `latency` seconds of sound, and the audio stream callback drains it. When the ring
+    buffer runs dry, the missing frames are filled with silence and counted as underruns.
+
+    The backend is any module providing OutputStream and CallbackStop like sounddevice (the
+    default). kapusim.playback.fake_output_stream plays into memory, without audio device.
+    """
+
+    def __init__(self, apu: Apu, data: bytes, cycles: int = None, sampleRate: int = APU_SAMPLE_RATE, blockSize: int = 512, latency: float = 0.1, backend=None):
+        self.logger = logging.getLogger(__name__)
+        self.apu = apu
+        self.data = data
+        self.cycles = cycles
+        self.sampleRate = sampleRate
+        self.blockSize = blockSize
+        self.latency = latency
+        self.backend = backend
+
+        self.ring = SampleRingBuffer(max(int(latency * sampleRate), 2 * blockSize))
+        self.producer = None
+        self.stream = None
+        self.produced = False       # The producer rendered everything (or failed)
+        self.error = None           # Exception raised by the producer
+        self.stopping = False       # Stop requested
+        self.finished = threading.Event()
+
+        # Statistics
+        self.framesRendered = 0
+        self.framesPlayed = 0
+        self.underruns = 0          # Callbacks that did not get enough frames from the ring buffer
+        self.underrunFrames = 0     # Silent frames inserted because of underruns
+        self.deviceUnderflows = 0   # Output underflows reported by the audio device
+
+    def start(self):
+        if self.backend is None:
+            import sounddevice
+            self.backend = sounddevice
+        self.producer = threading.Thread(target=self.produce, daemon=True)
+        self.producer.start()
+
+        # Prefill the ring buffer before opening the stream, to start without underrun
+        while self.ring.space() >= self.blockSize and not self.produced:
+            time.sleep(self.blockSize / self.sampleRate / 4)
+
+        self.stream = self.backend.OutputStream(
+            samplerate=self.sampleRate,
+            blocksize=self.blockSize,
+            channels=self.ring.frames.shape[1],
+            dtype="uint8",
+            latency=self.latency,
+            callback=self.callback,
+            finished_callback=self.finished.set,
+        )
+        self.stream.start()
+
+    def produce(self):
+        pause = self.blockSize / self.sampleRate / 2
+        try:
+            for chunk in self.apu.stream(self.data, self.cycles, self.blockSize):
+                frames = chunk.as_array()
+                written = 0
+                while written < len(frames):
+                    if self.stopping:
+                        return
+                    count = self.ring.write(frames[written:])
+                    written += count
+                    if count == 0:
+                        time.sleep(pause)  # Ring buffer full: wait for the callback to drain it
+                self.framesRendered += written
+        except Exception as e:
+            self.error = e
+        finally:
+            self.produced = True
+
+    def callback(self, outdata, frames: int, timeInfo, status):
+        if status and status.output_underflow:
+            self.deviceUnderflows += 1
+        produced = self.produced  # Checked before reading, so that no frame written in between is lost
+        count = self.ring.read(outdata)
+        self.framesPlayed += count
+        if count < frames:
+            outdata[count:] = APU_AMPLITUDE_SILENCE  # Not APU_AMPLITUDE_DEF: 0 is the full negative level, a click
+            if produced:
+                raise self.backend.CallbackStop()
+            self.underruns += 1
+            self.underrunFrames += frames - count
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.finished.wait(timeout)
+
+    def stop(self):
+        self.stopping = True
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+        if self.producer:
+            self.producer.join()
+
+    def play(self):
+        self.start()
+        try:
+            self.wait()
+        finally:
+            self.stop()
+        if self.error:
+            raise self.error
+        if self.underruns:
+            self.logger.warning(f"{self.underruns} underruns ({self.underrunFrames} silent frames) during playback")
+
+    def statistics(self) -> dict:
+        return {
+            "framesRendered": self.framesRendered,
+            "framesPlayed": self.framesPlayed,
+            "underruns": self.underruns,
+            "underrunFrames": self.underrunFrames,
+            "deviceUnderflows": self.deviceUnderflows,
+        }
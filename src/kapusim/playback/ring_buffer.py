@@ -0,0 +1,46 @@
+import numpy as np
+
+
+class SampleRingBuffer:
+    """Single-producer / single-consumer ring buffer of stereo 8-bit frames.
+
+    No lock is needed: the producer only moves writeIndex, the consumer only moves readIndex, and
+    both indexes only grow (the position in the buffer is the index modulo the capacity).
+    The consumer side never blocks, so it can be called from an audio callback.
+    """
+
+    def __init__(self, capacity: int, channels: int = 2):
+        if capacity < 1:
+            raise ValueError(f"Invalid ring buffer capacity: {capacity}")
+        self.capacity = capacity
+        self.frames = np.zeros((capacity, channels), dtype=np.uint8)
+        self.readIndex = 0   # Total number of frames read (consumer)
+        self.writeIndex = 0  # Total number of frames written (producer)
+
+    def available(self) -> int:
+        # Frames ready to be read
+        return self.writeIndex - self.readIndex
+
+    def space(self) -> int:
+        # Frames that can be written without overwriting unread ones
+        return self.capacity - self.available()
+
+    def write(self, frames: np.ndarray) -> int:
+        # Write as many frames as possible, returns how many were written
+        count = min(len(frames), self.space())
+        start = self.writeIndex % self.capacity
+        first = min(count, self.capacity - start)
+        self.frames[start:start + first] = frames[:first]
+        self.frames[:count - first] = frames[first:count]
+        self.writeIndex += count
+        return count
+
+    def read(self, out: np.ndarray) -> int:
+        # Read as many frames as possible into out, returns how many were read
+        count = min(len(out), self.available())
+        start = self.readIndex % self.capacity
+        first = min(count, self.capacity - start)
+        out[:first] = self.frames[start:start + first]
+        out[first:count] = self.frames[:count - first]
+        self.readIndex += count
+        return count
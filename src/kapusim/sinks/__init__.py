@@ -0,0 +1,37 @@
+from importlib import import_module
+
+from .output_sink import OutputSink
+
+SINKS = {  # Output format -> "module:class", the module being imported only when the format is selected
+    "wav": "kapusim.sinks.wav_sink:WavSink",
+    "sound": "kapusim.sinks.sound_sink:SoundSink",
+    "plot": "kapusim.sinks.plot_sink:PlotSink",
+    "raw": "kapusim.sinks.raw_sink:RawSink",
+    "npy": "kapusim.sinks.npy_sink:NpySink",
+    "null": "kapusim.sinks.null_sink:NullSink",
+}
+
+
+def register_sink(name: str, target: str):
+    # Add (or replace) an output format, target being "module:class" of an OutputSink subclass
+    SINKS[name] = target
+
+
+def sink_class(name: str) -> type:
+    if name not in SINKS:
+        raise ValueError(f"Unsupported output format: {name}")
+    module, _, cls = SINKS[name].partition(":")
+    return getattr(import_module(module), cls)
+
+
+def create_sink(name: str, **options) -> OutputSink:
+    return sink_class(name)(**options)
+
+
+__all__ = [
+    "OutputSink",
+    "SINKS",
+    "create_sink",
+    "register_sink",
+    "sink_class",
+]
@@ -0,0 +1,36 @@
+from ..core.apu_sample_buffer import ApuSampleBuffer
+from .output_sink import OutputSink
+
+
+class NpySink(OutputSink):
+    """NumPy .npy file of a (frames, 2) uint8 (or int16) array, loadable with numpy.load (or memory-mapped with mmap_mode).
+
+    The header has a fixed size (HEADER_SIZE bytes, space padded), so that the shape can be patched
+    at close when the number of frames was not known up front. Written without importing NumPy.
+    """
+
+    NAME = "NPY"
+    EXTENSION = ".npy"
+    NEEDS_FILE = True
+    HEADER_SIZE = 128  # Magic, version, header length and header dict, multiple of 64 for the alignment of the data
+
+    def header(self, frames: int) -> bytes:
+        descr = "|u1" if self.sample_width == 1 else "<i2"
+        description = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({frames}, {ApuSampleBuffer.CHANNELS}), }}"
+        padding = self.HEADER_SIZE - 10 - len(description) - 1
+        return b"\x93NUMPY\x01\x00" + (self.HEADER_SIZE - 10).to_bytes(2, "little") + description.encode("latin1") + b" " * padding + b"\n"
+
+    def open(self):
+        self.file = open(self.output_file, "wb")
+        self.file.write(self.header(self.frames or 0))
+
+    def write(self, chunk):
+        super().write(chunk)
+        self.file.write(self.samples(chunk))
+
+    def close(self):
+        if self.written != self.frames:
+            self.file.seek(0)
+            self.file.write(self.header(self.written))
+        self.file.close()
+        self.logger.info(f"NPY file written to '{self.output_file}'.")
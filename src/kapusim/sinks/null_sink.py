@@ -0,0 +1,10 @@
+from .output_sink import OutputSink
+
+
+class NullSink(OutputSink):
+    """Drops the samples, only counting them: measures the rendering alone (benchmarks)."""
+
+    NAME = "NULL"
+
+    def close(self):
+        self.logger.info(f"{self.written} frames rendered (discarded).")
@@ -0,0 +1,57 @@
+import logging
+
+import numpy as np
+
+from ..core.apu_constants import *
+from ..core.apu_sample_buffer import ApuSampleBuffer
+
+
+class OutputSink:
+    """Destination of the rendered samples, fed with the chunks as they are rendered.
+
+    A chunk is any buffer of interleaved 8-bit stereo frames (ApuSampleBuffer, bytes, memory map...).
+    Used as a context manager: open() on enter, write(chunk) for each chunk, close() on exit.
+    `frames` is the expected number of frames when known (to size a header or a buffer up front),
+    `written` the number of frames received so far. The file sinks write the samples as they come
+    (unsigned 8-bit, sample_width=1) or as signed 16-bit little endian ones (sample_width=2, see samples).
+    """
+
+    NAME = None
+    EXTENSION = None     # File extension of the output, None when not a file
+    NEEDS_FILE = False
+    SAMPLE_WIDTHS = [1, 2]
+    TO_16_BITS = ((np.arange(256, dtype=np.int16) - 128) << 8).astype("<i2")  # Unsigned 8-bit sample -> signed 16-bit one
+
+    def __init__(self, output_file: str = None, sample_rate: int = APU_SAMPLE_RATE, frames: int = None, sample_width: int = 1):
+        if self.NEEDS_FILE and not output_file:
+            raise ValueError(f"Output filename must be specified for {self.NAME} format.")
+        if sample_width not in self.SAMPLE_WIDTHS:
+            raise ValueError(f"Unsupported sample width for {self.NAME} format: {sample_width * 8} bits")
+        self.output_file = output_file
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.sample_width = sample_width
+        self.written = 0
+        self.logger = logging.getLogger(type(self).__module__)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        pass
+
+    def write(self, chunk):
+        self.written += len(chunk) // ApuSampleBuffer.CHANNELS
+
+    def samples(self, chunk):
+        # Chunk in the sample width of the output: the buffer itself, or converted to 16 bits with one table lookup
+        if self.sample_width == 1:
+            return chunk
+        return self.TO_16_BITS[np.frombuffer(chunk, dtype=np.uint8)]
+
+    def close(self):
+        pass
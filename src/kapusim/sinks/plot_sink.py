@@ -0,0 +1,43 @@
+import matplotlib.pyplot as plt
+import numpy as np
+
+from ..core.apu_sample_buffer import ApuSampleBuffer
+from .output_sink import OutputSink
+
+
+class PlotSink(OutputSink):
+    """Waveform plot of the left and right channels, shown once all the chunks are received."""
+
+    NAME = "PLOT"
+
+    def open(self):
+        # Known duration: chunks copied into a preallocated array
+        self.chunks = [] if self.frames is None else None
+        self.buffer = np.empty((self.frames, ApuSampleBuffer.CHANNELS), dtype=np.uint8) if self.frames is not None else None
+
+    def write(self, chunk):
+        chunk = ApuSampleBuffer.view(chunk)
+        if self.buffer is None:
+            self.chunks.append(chunk.copy())
+        else:
+            self.buffer[self.written:self.written + len(chunk)] = chunk
+        self.written += len(chunk)
+
+    def close(self):
+        if self.buffer is None:
+            frames = np.concatenate(self.chunks) if self.chunks else np.empty((0, ApuSampleBuffer.CHANNELS), dtype=np.uint8)
+        else:
+            frames = self.buffer[:self.written]
+        left = (frames[:, 0] - np.float32(128)) / 128
+        right = (frames[:, 1] - np.float32(128)) / 128
+
+        plt.figure(figsize=(10, 4))
+        plt.plot(left, label="Left Channel", linewidth=1.0)
+        plt.plot(right, label="Right Channel", linewidth=1.0)
+        plt.title("Waveform")
+        plt.xlabel("Sample Index")
+        plt.ylabel("Amplitude")
+        plt.legend()
+        plt.grid(True)
+        plt.tight_layout()
+        plt.show()
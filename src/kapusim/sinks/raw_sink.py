@@ -0,0 +1,20 @@
+from .output_sink import OutputSink
+
+
+class RawSink(OutputSink):
+    """Headerless PCM file: interleaved stereo frames (L0 R0 L1 R1 ...), unsigned 8-bit or signed 16-bit little endian samples."""
+
+    NAME = "RAW"
+    EXTENSION = ".raw"
+    NEEDS_FILE = True
+
+    def open(self):
+        self.file = open(self.output_file, "wb")
+
+    def write(self, chunk):
+        super().write(chunk)
+        self.file.write(self.samples(chunk))
+
+    def close(self):
+        self.file.close()
+        self.logger.info(f"Raw PCM file written to '{self.output_file}'.")
@@ -0,0 +1,25 @@
+import sounddevice as sd
+
+from ..core.apu_sample_buffer import ApuSampleBuffer
+from .output_sink import OutputSink
+
+
+class SoundSink(OutputSink):
+    """Playback on the default audio device, chunk by chunk (blocking writes)."""
+
+    NAME = "SOUND"
+
+    def open(self):
+        self.logger.info("Playing sound...")
+        self.stream = sd.OutputStream(samplerate=self.sample_rate, channels=ApuSampleBuffer.CHANNELS, dtype="uint8" if self.sample_width == 1 else "int16")
+        self.stream.__enter__()
+
+    def write(self, chunk):
+        super().write(chunk)
+        if self.sample_width == 1:
+            self.stream.write(ApuSampleBuffer.view(chunk))  # uint8 frames are played as they are
+        else:
+            self.stream.write(self.samples(chunk).reshape(-1, ApuSampleBuffer.CHANNELS))
+
+    def close(self):
+        self.stream.__exit__(None, None, None)
@@ -0,0 +1,48 @@
+import struct
+
+from ..core.apu_sample_buffer import ApuSampleBuffer
+from .output_sink import OutputSink
+
+
+class WavSink(OutputSink):
+    """Stereo WAV file (PCM, unsigned 8-bit or signed 16-bit samples), written as the chunks come.
+
+    The 44-byte RIFF header is written first, with the sizes of the expected number of frames
+    (0 when unknown), and patched at close if another number of frames was written. The chunks are
+    written straight from their buffer (converted with one table lookup for 16-bit samples).
+    """
+
+    NAME = "WAV"
+    EXTENSION = ".wav"
+    NEEDS_FILE = True
+    HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")  # RIFF chunk, fmt sub-chunk (PCM), data sub-chunk header
+    RIFF_SIZE_OFFSET = 4
+    DATA_SIZE_OFFSET = 40
+
+    def header(self, frames: int) -> bytes:
+        block = ApuSampleBuffer.CHANNELS * self.sample_width
+        size = frames * block
+        return self.HEADER.pack(
+            b"RIFF", 36 + size, b"WAVE",
+            b"fmt ", 16, 1, ApuSampleBuffer.CHANNELS, self.sample_rate, self.sample_rate * block, block, self.sample_width * 8,
+            b"data", size,
+        )
+
+    def open(self):
+        self.file = open(self.output_file, "wb")
+        self.file.write(self.header(self.frames or 0))
+
+    def write(self, chunk):
+        super().write(chunk)
+        self.file.write(self.samples(chunk))
+
+    def close(self):
+        if self.written != self.frames:
+            # Sizes of the frames actually written
+            size = self.written * ApuSampleBuffer.CHANNELS * self.sample_width
+            self.file.seek(self.RIFF_SIZE_OFFSET)
+            self.file.write(struct.pack("<I", 36 + size))
+            self.file.seek(self.DATA_SIZE_OFFSET)
+            self.file.write(struct.pack("<I", size))
+        self.file.close()
+        self.logger.info(f"WAV file written to '{self.output_file}'.")
@@ -0,0 +1,33 @@
+import unittest
+from pathlib import Path
+
+from kaapiler.core.kaa_compiler import KaaCompiler
+from kapusim.core.apu import Apu
+
+SAMPLES = Path(__file__).parent.parent / "samples" / "kaa"
+
+
+class ApuEnginesTest(unittest.TestCase):
+    """The fast-forward engines (event, block) are sample-exact against the cycle-by-cycle reference."""
+
+    SECONDS = 3
+    RATIOS = [16, 7]
+
+    def test_sample_programs(self):
+        sources = sorted(SAMPLES.glob("*.kaa"))
+        self.assertTrue(sources, f"No sample program in '{SAMPLES}'")
+        for source in sources:
+            data = KaaCompiler().compile(source.read_text())
+            for ratio in self.RATIOS:
+                cycles = self.SECONDS * 44100 * ratio + ratio // 2  # Ends between two sampling cycles
+                reference = Apu(ratio, Apu.ENGINE_CYCLE)
+                expected = bytes(reference.run(data, cycles))
+                for engine in [Apu.ENGINE_EVENT, Apu.ENGINE_BLOCK]:
+                    with self.subTest(program=source.name, ratio=ratio, engine=engine):
+                        apu = Apu(ratio, engine)
+                        self.assertEqual(bytes(apu.run(data, cycles)), expected)
+                        self.assertEqual(apu.snapshot(), reference.snapshot())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+
+from kaapiler.parser.kaa_tables import KAA_STARTUP_BUDGET, benchmark, prebuiltTables
+
+
+class KaaTablesTest(unittest.TestCase):
+    """Start-up budget of the kaapiler: prebuilt tables, loaded without writing any file."""
+
+    def test_prebuilt_tables(self):
+        # Outdated after a change of kaa_lexer.py or kaa_parser.py: python -m kaapiler.parser build
+        self.assertTrue(prebuiltTables())
+
+    def test_startup_budget(self):
+        result = benchmark(runs=5)
+        self.assertEqual(result["written"], [])
+        self.assertLessEqual(result["startup"], KAA_STARTUP_BUDGET, result)
+
+
+if __name__ == "__main__":
+    unittest.main()